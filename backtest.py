@@ -9,6 +9,8 @@ from sklearn.preprocessing import MinMaxScaler
 import matplotlib.pyplot as plt
 import joblib
 from keras.models import load_model
+from indicators import ema, rolling_max, rolling_mean, rolling_min, rolling_std, shift
+from sequences import sliding_windows
 from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error, r2_score
 
 # Logging configuration
@@ -54,54 +56,53 @@ def fetch_historical_data(symbol, timeframe, start_date, end_date):
 # Step 2: Preprocess Data (Feature Engineering and Scaling)
 # ---------------------------
 def preprocess_data(data):
+    close, high, low = (data[col].to_numpy(dtype=np.float64) for col in ('close', 'high', 'low'))
+
+    # Rolling primitives from the shared indicator engine, each computed once
+    std_14 = rolling_std(close, 14)
+    highest_14, lowest_14 = rolling_max(high, 14), rolling_min(low, 14)
+    delta = np.diff(close, prepend=np.nan)
+
     # Calculate technical indicators
-    data['SMA_10'] = data['close'].rolling(window=10).mean()
-    data['EMA_10'] = data['close'].ewm(span=10, adjust=False).mean()
+    data['SMA_10'] = rolling_mean(close, 10)
+    data['EMA_10'] = ema(close, 10)
     
     # RSI Calculation
-    delta = data['close'].diff(1)
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
-    data['RSI'] = 100 - (100 / (1 + (avg_gain / avg_loss)))
+    avg_gain = rolling_mean(np.where(delta > 0, delta, 0), 14)
+    avg_loss = rolling_mean(np.where(delta < 0, -delta, 0), 14)
+    with np.errstate(divide='ignore'):
+        data['RSI'] = 100 - (100 / (1 + (avg_gain / avg_loss)))
     
     # MACD and Signal Line
-    data['EMA_12'] = data['close'].ewm(span=12, adjust=False).mean()
-    data['EMA_26'] = data['close'].ewm(span=26, adjust=False).mean()
-    data['MACD'] = data['EMA_12'] - data['EMA_26']
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
+    macd = ema(close, 12) - ema(close, 26)
+    data['MACD'] = macd
+    data['Signal_Line'] = ema(macd, 9)
     
     # Bollinger Bands
-    data['BB_Middle'] = data['close'].rolling(window=20).mean()
-    data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-    data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-    
-    # ATR
-    data['prev_close'] = data['close'].shift(1)
-    data['High_Low'] = data['high'] - data['low']
-    data['High_Close'] = abs(data['high'] - data['prev_close'])
-    data['Low_Close'] = abs(data['low'] - data['prev_close'])
-    data['TR'] = data[['High_Low', 'High_Close', 'Low_Close']].max(axis=1)
-    data['ATR'] = data['TR'].rolling(window=14).mean()
+    mean_20, std_20 = rolling_mean(close, 20), rolling_std(close, 20)
+    data['BB_Upper'] = mean_20 + 2 * std_20
+    data['BB_Lower'] = mean_20 - 2 * std_20
+    
+    # ATR (true range; fmax skips the missing previous close on the first bar)
+    prev_close = shift(close, 1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    data['ATR'] = rolling_mean(true_range, 14)
     
     # Stochastic Oscillator
-    data['Lowest_Low'] = data['low'].rolling(window=14).min()
-    data['Highest_High'] = data['high'].rolling(window=14).max()
-    data['Stochastic'] = ((data['close'] - data['Lowest_Low']) / (data['Highest_High'] - data['Lowest_Low'])) * 100
+    data['Stochastic'] = ((close - lowest_14) / (highest_14 - lowest_14)) * 100
     
     # Donchian Channels
-    data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-    data['Donchian_Lower'] = data['low'].rolling(window=20).min()
+    data['Donchian_Upper'] = rolling_max(high, 20)
+    data['Donchian_Lower'] = rolling_min(low, 20)
     
     # Standard Deviation, CV, ROC
-    data['Std_Dev'] = data['close'].rolling(window=14).std()
-    data['CV'] = data['Std_Dev'] / data['close'].rolling(window=14).mean()
-    data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
+    data['Std_Dev'] = std_14
+    data['CV'] = std_14 / rolling_mean(close, 14)
+    data['ROC'] = (close - shift(close, 14)) / shift(close, 14) * 100
     
     # Williams %R and Short-Term Price Change
-    data['Williams_%R'] = ((data['Highest_High'] - data['close']) / (data['Highest_High'] - data['Lowest_Low'])) * -100
-    data['Price_Change_5'] = data['close'].diff(5)
+    data['Williams_%R'] = ((highest_14 - close) / (highest_14 - lowest_14)) * -100
+    data['Price_Change_5'] = close - shift(close, 5)
     
     # Fill missing values
     data.fillna(method='bfill', inplace=True)
@@ -123,10 +124,7 @@ def preprocess_data(data):
 # Step 3: Create Time-Series Sequences for LSTM Inference
 # ---------------------------
 def create_sequences(data, time_window):
-    X_seq = []
-    for i in range(len(data) - time_window):
-        X_seq.append(data[i:i + time_window])
-    return np.array(X_seq)
+    return sliding_windows(data, time_window)
 
 # ---------------------------
 # Step 4: Load Trained Model and Scaler
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import asyncio
+import numpy as np
+
+# Compares /predict inference paths under concurrent load: model.predict per
+# request (the original service) and one call of main's compiled serving
+# function per request, both run as FastAPI runs sync endpoints (each request
+# on a threadpool thread), against main's MicroBatcher over the compiled
+# function. CLIENTS concurrent clients each send requests back to back;
+# reported are requests/sec and latency percentiles. HTTP/JSON handling,
+# identical for all paths, is left out.
+#
+#   python benchmark_serving.py [clients ...]
+
+REQUESTS_PER_CLIENT = int(os.getenv('BENCHMARK_REQUESTS') or 50)
+CLIENTS = (1, 8, 32, 128)
+
+
+async def _load(call, window_shape, clients):
+    rng = np.random.default_rng(42)
+    latencies = []
+
+    async def client():
+        for _ in range(REQUESTS_PER_CLIENT):
+            window = rng.random(window_shape, dtype=np.float32)
+            started = time.perf_counter()
+            await call(window)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return {'requests_per_sec': len(latencies) / elapsed, 'p50_ms': np.percentile(latencies, 50),
+            'p99_ms': np.percentile(latencies, 99)}
+
+
+async def run(clients):
+    import main
+
+    def keras_predict(windows):
+        prediction = main.model.predict(windows, verbose=0)
+        return main.y_scaler.inverse_transform(prediction.reshape(-1, 1))[:, 0]
+
+    async def predict(window):
+        return await asyncio.to_thread(keras_predict, window[None])
+
+    async def unbatched(window):
+        return await asyncio.to_thread(main.predict_windows, window[None])
+
+    batcher = main.MicroBatcher(main.predict_windows)
+    await batcher.start()
+    try:
+        # main warms its compiled function on import; model.predict is warmed here
+        await _load(predict, main.WINDOW_SHAPE, 2)
+        paths = (('model.predict', predict), ('compiled', unbatched), ('batched', batcher.submit))
+        for count in clients:
+            for name, call in paths:
+                result = await _load(call, main.WINDOW_SHAPE, count)
+                print(f"{count:>4} clients {name:>13}: {result['requests_per_sec']:8,.0f} requests/sec, "
+                      f"p50 {result['p50_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms")
+    finally:
+        await batcher.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run([int(count) for count in sys.argv[1:]] or CLIENTS))
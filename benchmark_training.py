@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+
+# Compares training profiles (see training_profile.py) on the same data:
+# samples/sec and the best validation loss each reaches. A faster profile is
+# only acceptable if its validation loss is within QUALITY_TOLERANCE of the
+# default one's. Each profile runs in its own process, since TensorFlow's
+# thread pools can only be configured once per process.
+#
+#   python benchmark_training.py [profile ...]
+
+QUALITY_TOLERANCE = 0.05  # max relative increase in best val_loss over the default profile
+EPOCHS = int(os.getenv('BENCHMARK_EPOCHS') or 20)
+NUM_BARS = 20000
+
+
+def run_profile(name):
+    """Trains the training1 GRU with one profile and returns its results."""
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.callbacks import EarlyStopping
+    import tensorflow as tf
+    import training_data
+    from candle_store import CandleStore
+    from precision_check import synthetic_candles
+    from training_profile import ThroughputReport, build_gru, configure_threads, get_profile
+    from window_dataset import WindowDataset, window_count
+
+    profile = get_profile(name)
+    configure_threads(profile)
+    tf.keras.utils.set_random_seed(42)
+
+    symbol = os.getenv('SYMBOL') or 'EURUSD'
+    timeframe = os.getenv('TIMEFRAME') or '4h'
+    data = CandleStore(symbol, timeframe).load()
+    if len(data) < 1000:
+        data = synthetic_candles(NUM_BARS)
+    root = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        series, _, _ = training_data.build_series({symbol: data}, timeframe, root=root)
+        train_idx, val_idx = train_test_split(np.arange(window_count(series)), test_size=0.15, random_state=42)
+        kwargs = {'batch_size': profile['batch_size'], 'workers': profile['workers'],
+                  'max_queue_size': profile['max_queue_size'], 'seed': 42}
+        train_data = WindowDataset(series, train_idx, **kwargs)
+        val_data = WindowDataset(series, val_idx, shuffle=False, **kwargs)
+
+        model = build_gru(train_data.window_shape, profile['learning_rate'], profile['jit_compile'])
+        throughput = ThroughputReport(len(train_idx))
+        history = model.fit(train_data, epochs=EPOCHS, validation_data=val_data, verbose=0,
+                            callbacks=[EarlyStopping(monitor="val_loss", patience=5), throughput])
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    # The first epoch includes tracing/XLA compilation, so it is left out of the rate
+    rates = throughput.rates[1:] or throughput.rates
+    return {'profile': name, 'samples_per_sec': float(np.median(rates)),
+            'val_loss': float(min(history.history['val_loss'])), 'epochs': len(history.history['val_loss'])}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--run':
+        print(json.dumps(run_profile(sys.argv[2])))
+        sys.exit()
+
+    names = sys.argv[1:] or ['default', 'cpu']
+    if 'default' not in names:
+        names.insert(0, 'default')
+    results = {}
+    for name in names:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', name],
+                                check=True, capture_output=True, text=True).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+
+    baseline = results['default']
+    for name, result in results.items():
+        speedup = result['samples_per_sec'] / baseline['samples_per_sec']
+        drift = result['val_loss'] / baseline['val_loss'] - 1
+        verdict = 'ok' if drift <= QUALITY_TOLERANCE else f"val_loss over the {QUALITY_TOLERANCE:.0%} tolerance"
+        print(f"{name:>8}: {result['samples_per_sec']:10,.0f} samples/sec ({speedup:4.1f}x), "
+              f"val_loss {result['val_loss']:.6f} ({drift:+.1%}) after {result['epochs']} epochs - {verdict}")
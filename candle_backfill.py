@@ -0,0 +1,242 @@
+import os
+import asyncio
+import logging
+import random
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from candle_buffer import COLUMNS, CandleBuffer
+
+# Concurrent historical candle download. The requested range is cut into
+# non-overlapping time windows that each fit in one MetaApi page, the windows
+# are fetched in parallel under a semaphore and merged into one sorted series.
+# Requests are paced to a budget and retried with backoff, and every completed
+# window is checkpointed to disk so an interrupted download resumes where it
+# stopped instead of starting over.
+
+TIMEFRAMES = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '2h': timedelta(hours=2),
+    '3h': timedelta(hours=3),
+    '4h': timedelta(hours=4),
+    '6h': timedelta(hours=6),
+    '8h': timedelta(hours=8),
+    '12h': timedelta(hours=12),
+    '1d': timedelta(days=1),
+}
+
+MAX_PAGE_SIZE = 1000  # MetaApi returns at most 1000 candles per request
+MAX_CONCURRENT_REQUESTS = 5
+REQUESTS_PER_SECOND = float(os.getenv('METAAPI_REQUESTS_PER_SECOND') or 10)
+MAX_RETRIES = 8
+RETRY_DELAY = 1  # seconds, base of the exponential backoff
+MAX_RETRY_DELAY = 120
+CHECKPOINT_DIR = os.path.join('candles', '.checkpoints')
+WEEKEND_FACTOR = 1.5  # FX trades ~5 of 7 days, so a bar count spans ~1.4x its raw duration
+MIN_BACKFILL_SPAN = timedelta(days=7)  # An empty week means the history is exhausted
+
+
+def timeframe_to_timedelta(timeframe):
+    """Returns the bar length of a MetaApi timeframe string such as '4h'."""
+    try:
+        return TIMEFRAMES[timeframe]
+    except KeyError:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+
+def candles_to_frame(candles):
+    """Converts a list of MetaApi candle dicts into the standard six-column frame."""
+    return CandleBuffer.from_candles(candles).to_frame()
+
+
+def merge_candles(*frames):
+    """Concatenates candle frames into one sorted series without duplicate bars."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return candles_to_frame([])
+    data = pd.concat(frames, ignore_index=True)
+    data = data.drop_duplicates(subset='time', keep='last').sort_values('time')
+    return data.reset_index(drop=True)
+
+
+def split_windows(start_time, end_time, timeframe):
+    """Cuts (start_time, end_time] into windows of at most one page of bars each.
+
+    Window boundaries sit on a fixed grid (multiples of one page's duration
+    since the epoch) so repeated or resumed downloads ask for the same windows
+    and can reuse their checkpoints.
+    """
+    span = pd.Timedelta(timeframe_to_timedelta(timeframe) * MAX_PAGE_SIZE).value
+    start, end = pd.Timestamp(start_time).value, pd.Timestamp(end_time).value
+    windows = []
+    window_end = -(-end // span) * span
+    while window_end > start:
+        windows.append((pd.Timestamp(window_end - span, tz='UTC'), pd.Timestamp(window_end, tz='UTC')))
+        window_end -= span
+    return windows
+
+
+class RequestBudget:
+    """Bounds in-flight requests and paces them to a fixed rate.
+
+    One budget is shared by every window of every symbol downloaded over the
+    same account, so adding symbols never exceeds the account's request limits.
+    """
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, concurrency=MAX_CONCURRENT_REQUESTS):
+        self.interval = 1 / requests_per_second
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._next_slot = 0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds back every pending request, e.g. after the server throttled us."""
+        self._next_slot = max(self._next_slot, asyncio.get_running_loop().time() + seconds)
+
+
+def atomic_write(path, writer, mode='wb'):
+    """Calls writer(f) on a file next to path, then renames it over path.
+
+    Readers see either the old file or the complete new one, never a torn
+    write, even if the process dies mid-write.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, mode) as f:
+        writer(f)
+    os.replace(temporary, path)
+
+
+class WindowCheckpoints:
+    """On-disk checkpoints of completed backfill windows for one symbol/timeframe."""
+
+    def __init__(self, symbol, timeframe, root=None):
+        self.path = os.path.join(root or CHECKPOINT_DIR, f"{symbol}_{timeframe}")
+
+    def _window_path(self, window_end):
+        return os.path.join(self.path, f"{window_end.value}.npz")
+
+    def load(self, window_end):
+        path = self._window_path(window_end)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as page:
+            return {column: page[column] for column in COLUMNS}
+
+    def save(self, window_end, columns):
+        os.makedirs(self.path, exist_ok=True)
+        atomic_write(self._window_path(window_end), lambda f: np.savez(f, **columns))
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+# MetaApi SDK errors worth retrying; others (unknown symbol, validation, auth) fail the same way every time
+TRANSIENT_ERRORS = ('TooManyRequestsException', 'TimeoutException', 'NotConnectedException', 'InternalException')
+
+
+def _is_throttled(err):
+    return type(err).__name__ == 'TooManyRequestsException' or getattr(err, 'status_code', None) == 429
+
+
+def is_transient(err):
+    """Throttling, timeouts, dropped connections and server errors, which a retry can get past."""
+    if isinstance(err, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = getattr(err, 'status_code', None)
+    return type(err).__name__ in TRANSIENT_ERRORS or status == 429 or (status or 0) >= 500
+
+
+def _retry_delay(err, attempt):
+    """Server-recommended retry time if given, else exponential backoff with full jitter."""
+    metadata = getattr(err, 'metadata', None) or {}
+    if metadata.get('recommendedRetryTime'):
+        retry_at = pd.Timestamp(metadata['recommendedRetryTime'])
+        return max((retry_at - pd.Timestamp.now(tz='UTC')).total_seconds(), RETRY_DELAY)
+    return random.uniform(0, min(RETRY_DELAY * 2 ** attempt, MAX_RETRY_DELAY))
+
+
+async def fetch_page(account, symbol, timeframe, window_end, budget):
+    """Requests one page, retrying transient errors and throttling with backoff.
+
+    Any other error (e.g. an unknown symbol) is raised at once.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        await budget.acquire()
+        try:
+            return await account.get_historical_candles(symbol, timeframe, window_end, MAX_PAGE_SIZE) or []
+        except Exception as e:
+            if attempt == MAX_RETRIES or not is_transient(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            if _is_throttled(e):
+                budget.pause(delay)
+            logging.warning(f"Candle request for {symbol} {timeframe} at {window_end} failed: {e}; "
+                            f"retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def fetch_window(account, symbol, timeframe, window_start, window_end, buffer, budget, checkpoints):
+    """Downloads the bars in (window_start, window_end] into the shared buffer."""
+    columns = checkpoints.load(window_end)
+    if columns is None:
+        async with budget.semaphore:
+            page = CandleBuffer.from_candles(await fetch_page(
+                account, symbol, timeframe, min(window_end, pd.Timestamp.now(tz='UTC')), budget))
+        times = page['time']
+        page.select((times > window_start.value) & (times <= window_end.value))
+        columns = page.columns()
+        # Only windows that can no longer change are checkpointed.
+        if window_end + timeframe_to_timedelta(timeframe) <= pd.Timestamp.now(tz='UTC'):
+            checkpoints.save(window_end, columns)
+    buffer.extend_arrays(**columns)
+    logging.info(f"{symbol} {timeframe}: {len(columns['time'])} bars up to {window_end} "
+                 f"({len(buffer)} in this batch)")
+
+
+async def backfill_range(account, symbol, timeframe, start_time, end_time=None, budget=None, checkpoints=None):
+    """Downloads every bar in (start_time, end_time], fetching windows concurrently within the budget."""
+    end_time = end_time or datetime.now(timezone.utc)
+    budget = budget or RequestBudget()
+    checkpoints = checkpoints or WindowCheckpoints(symbol, timeframe)
+    windows = split_windows(start_time, end_time, timeframe)
+    buffer = CandleBuffer(len(windows) * MAX_PAGE_SIZE)
+    await asyncio.gather(*[
+        fetch_window(account, symbol, timeframe, window_start, window_end, buffer, budget, checkpoints)
+        for window_start, window_end in windows
+    ])
+    times = buffer['time']
+    buffer.select((times > pd.Timestamp(start_time).value) & (times <= pd.Timestamp(end_time).value))
+    return buffer.sort_unique().to_frame()
+
+
+async def backfill_candles(account, symbol, timeframe, num_candles, end_time=None, budget=None, checkpoints=None):
+    """Downloads the latest num_candles bars ending at end_time."""
+    end_time = end_time or datetime.now(timezone.utc)
+    budget = budget or RequestBudget()
+    checkpoints = checkpoints or WindowCheckpoints(symbol, timeframe)
+    step = timeframe_to_timedelta(timeframe)
+    data = candles_to_frame([])
+
+    while len(data) < num_candles:
+        # Estimate how far back the missing bars reach; weekends and holidays
+        # mean one estimate may fall short, so keep stepping back until full.
+        missing = num_candles - len(data)
+        start_time = end_time - max(step * int(missing * WEEKEND_FACTOR + 1), MIN_BACKFILL_SPAN)
+        chunk = await backfill_range(account, symbol, timeframe, start_time, end_time, budget, checkpoints)
+        if chunk.empty:
+            break  # No more history available
+        data = merge_candles(chunk, data)
+        end_time = start_time
+
+    return data.iloc[-num_candles:].reset_index(drop=True)
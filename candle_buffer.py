@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# Structure-of-arrays candle container. Each column lives in its own
+# preallocated typed NumPy array that grows geometrically, so accumulating
+# MetaApi pages costs no per-candle Python objects and the filled part is
+# exposed to pandas and the indicator code as views rather than copies.
+
+COLUMNS = ('time', 'open', 'high', 'low', 'close', 'tickVolume')
+DTYPES = {
+    'time': np.int64,  # nanoseconds since epoch, UTC
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'tickVolume': np.float64,
+}
+INITIAL_CAPACITY = 1024
+GROWTH_FACTOR = 2
+
+
+def _to_nanoseconds(value):
+    """Converts a MetaApi candle time (datetime or pandas Timestamp) to epoch nanoseconds."""
+    return pd.Timestamp(value).value
+
+
+class CandleBuffer:
+    """Growable columnar buffer of OHLCV candles."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._arrays = {column: np.empty(capacity, dtype=DTYPES[column]) for column in COLUMNS}
+        self._size = 0
+
+    @classmethod
+    def from_candles(cls, candles):
+        """Builds a buffer from a list of MetaApi candle dicts."""
+        buffer = cls(max(len(candles), INITIAL_CAPACITY))
+        buffer.extend(candles)
+        return buffer
+
+    @classmethod
+    def from_arrays(cls, **columns):
+        """Wraps existing column arrays without copying them (e.g. store memmaps)."""
+        buffer = cls(0)
+        buffer._arrays = {column: np.asarray(columns[column]) for column in COLUMNS}
+        buffer._size = len(buffer._arrays['time'])
+        return buffer
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._arrays['time'])
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        capacity = max(self.capacity, INITIAL_CAPACITY)
+        while capacity < size:
+            capacity *= GROWTH_FACTOR
+        for column in COLUMNS:
+            grown = np.empty(capacity, dtype=DTYPES[column])
+            grown[:self._size] = self._arrays[column][:self._size]
+            self._arrays[column] = grown
+
+    def extend(self, candles):
+        """Appends a page of MetaApi candle dicts."""
+        count = len(candles)
+        if not count:
+            return
+        self._reserve(self._size + count)
+        end = self._size + count
+        self._arrays['time'][self._size:end] = np.fromiter(
+            (_to_nanoseconds(candle['time']) for candle in candles), dtype=np.int64, count=count)
+        for column in COLUMNS[1:]:
+            self._arrays[column][self._size:end] = np.fromiter(
+                (candle[column] for candle in candles), dtype=DTYPES[column], count=count)
+        self._size = end
+
+    def extend_arrays(self, **columns):
+        """Appends column arrays of equal length."""
+        count = len(columns['time'])
+        if not count:
+            return
+        self._reserve(self._size + count)
+        end = self._size + count
+        for column in COLUMNS:
+            self._arrays[column][self._size:end] = columns[column]
+        self._size = end
+
+    def __getitem__(self, column):
+        """Returns a view of the filled part of one column."""
+        return self._arrays[column][:self._size]
+
+    def columns(self):
+        return {column: self[column] for column in COLUMNS}
+
+    def sort_unique(self):
+        """Sorts by time in place and drops duplicate bars, keeping the last occurrence."""
+        times = self['time']
+        # Reverse first so np.unique's first occurrence is the last one appended.
+        order = np.argsort(times[::-1], kind='stable')
+        _, first = np.unique(times[::-1][order], return_index=True)
+        index = (self._size - 1) - order[first]
+        for column in COLUMNS:
+            self._arrays[column] = self._arrays[column][index]
+        self._size = len(index)
+        return self
+
+    def select(self, mask):
+        """Keeps only the rows where mask is True."""
+        for column in COLUMNS:
+            self._arrays[column] = self[column][mask]
+        self._size = int(np.count_nonzero(mask))
+        return self
+
+    def to_frame(self):
+        """Returns the standard six-column frame backed by the buffer's arrays."""
+        data = pd.DataFrame({column: self[column] for column in COLUMNS[1:]}, copy=False)
+        times = pd.DatetimeIndex(self['time'].view('datetime64[ns]')).tz_localize('UTC')
+        data.insert(0, 'time', times)
+        return data
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+import logging
+import shutil
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from candle_buffer import COLUMNS, DTYPES, CandleBuffer
+from candle_backfill import (
+    timeframe_to_timedelta, merge_candles, backfill_range, backfill_candles,
+    RequestBudget, WindowCheckpoints, atomic_write
+)
+
+# Local on-disk candle store: one directory per symbol/timeframe holding one raw
+# binary file per column. Files are append-only and read back with np.memmap, so
+# loading 20k+ bars is a sub-second local read instead of a MetaApi backfill.
+# The column files live in a generation subdirectory named by the CURRENT
+# pointer file; a rewrite builds a new generation and swaps the pointer with
+# one rename. Writers hold an exclusive lock on the store directory.
+
+STORE_DIR = 'candles'
+CURRENT = 'CURRENT'
+
+
+def drop_open_bar(data, timeframe, now=None):
+    """Removes the bar that is still forming so only closed bars get persisted."""
+    if data.empty:
+        return data
+    now = now or datetime.now(timezone.utc)
+    closes_at = data['time'] + timeframe_to_timedelta(timeframe)
+    return data[closes_at <= pd.Timestamp(now)]
+
+
+class CandleStore:
+    """Append-only columnar candle history for one symbol and timeframe."""
+
+    def __init__(self, symbol, timeframe, root=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.path = os.path.join(root or STORE_DIR, f"{symbol}_{timeframe}")
+
+    def _data_path(self):
+        """Directory holding the live column files."""
+        try:
+            with open(os.path.join(self.path, CURRENT)) as f:
+                return os.path.join(self.path, f.read().strip())
+        except FileNotFoundError:
+            return self.path  # Stores written before generations keep their columns at the top
+
+    def _column_path(self, column, directory):
+        return os.path.join(directory, f"{column}.bin")
+
+    def _length(self, directory):
+        # A write interrupted midway leaves some columns longer than others;
+        # only rows present in every column count.
+        lengths = []
+        for column in COLUMNS:
+            path = self._column_path(column, directory)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // np.dtype(DTYPES[column]).itemsize)
+        return min(lengths)
+
+    def _read_column(self, column, directory, length):
+        path = self._column_path(column, directory)
+        if length == 0 or not os.path.exists(path):
+            return np.empty(0, dtype=DTYPES[column])
+        return np.memmap(path, dtype=DTYPES[column], mode='r')[:length]
+
+    def __len__(self):
+        return self._length(self._data_path())
+
+    def columns(self):
+        """Returns the stored columns as read-only memory-mapped arrays."""
+        directory = self._data_path()
+        length = self._length(directory)
+        return {column: self._read_column(column, directory, length) for column in COLUMNS}
+
+    def load(self):
+        """Loads the full stored history as a DataFrame."""
+        return CandleBuffer.from_arrays(**self.columns()).to_frame()
+
+    def _times(self):
+        directory = self._data_path()
+        return self._read_column('time', directory, self._length(directory))
+
+    def first_time(self):
+        times = self._times()
+        return pd.Timestamp(int(times[0]), tz='UTC') if len(times) else None
+
+    def last_time(self):
+        times = self._times()
+        return pd.Timestamp(int(times[-1]), tz='UTC') if len(times) else None
+
+    @contextmanager
+    def _locked(self):
+        """Serializes writers, e.g. two processes syncing the same store."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _values(self, data):
+        times = data['time'].astype('datetime64[ns, UTC]').to_numpy(dtype='datetime64[ns]')
+        values = {'time': times.view(np.int64)}
+        for column in COLUMNS[1:]:
+            values[column] = data[column].to_numpy(dtype=DTYPES[column])
+        return {column: np.ascontiguousarray(values[column]).tobytes() for column in COLUMNS}
+
+    def _write_meta(self):
+        atomic_write(os.path.join(self.path, 'meta.json'),
+                     lambda f: json.dump({'symbol': self.symbol, 'timeframe': self.timeframe,
+                                          'rows': len(self)}, f), 'w')
+
+    def append(self, data):
+        """Appends bars newer than the last stored one; returns how many were written."""
+        with self._locked():
+            last = self.last_time()
+            if last is not None:
+                data = data[data['time'] > last]
+            if data.empty:
+                return 0
+            directory = self._data_path()
+            length = self._length(directory)
+            # Trim any torn tail from an interrupted write before appending.
+            for column in COLUMNS:
+                path = self._column_path(column, directory)
+                if os.path.exists(path):
+                    os.truncate(path, length * np.dtype(DTYPES[column]).itemsize)
+            for column, values in self._values(merge_candles(data)).items():
+                with open(self._column_path(column, directory), 'ab') as f:
+                    f.write(values)
+            self._write_meta()
+            return len(data)
+
+    def replace(self, data):
+        """Rewrites the store with the given history (used when backfilling older bars).
+
+        Bars stored meanwhile by another writer are kept unless data has them
+        too. All columns go to a new generation directory that becomes live
+        with one rename of the CURRENT pointer, so an interrupted rewrite keeps
+        the old history whole, and memmaps still open on the old files (data
+        may be one) stay valid.
+        """
+        with self._locked():
+            columns = self._values(merge_candles(self.load(), data))
+            generation = f"g{time.time_ns()}"
+            directory = os.path.join(self.path, generation)
+            os.makedirs(directory)
+            for column, values in columns.items():
+                with open(self._column_path(column, directory), 'wb') as f:
+                    f.write(values)
+            atomic_write(os.path.join(self.path, CURRENT), lambda f: f.write(generation), 'w')
+            # Drop older generations, including any left by an interrupted rewrite
+            for entry in os.scandir(self.path):
+                if entry.is_dir() and entry.name != generation:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                elif entry.name.endswith('.bin'):
+                    os.remove(entry.path)
+            self._write_meta()
+
+
+async def sync_historical_candles(account, symbol, timeframe, num_candles, root=None, budget=None):
+    """Returns the latest num_candles bars, downloading only what the local store lacks."""
+    store = CandleStore(symbol, timeframe, root)
+    checkpoints = WindowCheckpoints(symbol, timeframe, os.path.join(root, '.checkpoints') if root else None)
+    budget = budget or RequestBudget()
+    now = datetime.now(timezone.utc)
+    last = store.last_time()
+
+    if last is None:
+        fetched = await backfill_candles(account, symbol, timeframe, num_candles, now,
+                                         budget=budget, checkpoints=checkpoints)
+        store.replace(drop_open_bar(fetched, timeframe, now))
+        checkpoints.clear()  # Everything is in the store now
+        return fetched.iloc[-num_candles:].reset_index(drop=True)
+
+    newer = await backfill_range(account, symbol, timeframe, last, now, budget=budget, checkpoints=checkpoints)
+    store.append(drop_open_bar(newer, timeframe, now))
+
+    history = store.load()
+    missing = num_candles - len(history)
+    if missing > 0:
+        older = await backfill_candles(account, symbol, timeframe, missing,
+                                       history['time'].iloc[0] - timeframe_to_timedelta(timeframe),
+                                       budget=budget, checkpoints=checkpoints)
+        if not older.empty:
+            history = merge_candles(older, history)
+            store.replace(history)
+    checkpoints.clear()
+
+    data = merge_candles(history, newer)
+    return data.iloc[-num_candles:].reset_index(drop=True)
+
+
+async def sync_many(account, symbols, timeframes, num_candles, root=None, budget=None):
+    """Syncs every symbol/timeframe pair concurrently over one account.
+
+    All downloads share one request budget, so the total time tracks the
+    slowest symbol rather than the sum. Returns {(symbol, timeframe): frame};
+    a pair that fails is logged and left out instead of aborting the rest.
+    """
+    budget = budget or RequestBudget()
+    pairs = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
+
+    async def sync_one(symbol, timeframe):
+        data = await sync_historical_candles(account, symbol, timeframe, num_candles, root, budget)
+        logging.info(f"{symbol} {timeframe}: {len(data)} candles ready")
+        return data
+
+    results = await asyncio.gather(*[sync_one(symbol, timeframe) for symbol, timeframe in pairs],
+                                   return_exceptions=True)
+    candles = {}
+    for pair, result in zip(pairs, results):
+        if isinstance(result, Exception):
+            logging.error(f"Failed to sync {pair[0]} {pair[1]}: {str(result)}")
+        else:
+            candles[pair] = result
+    return candles
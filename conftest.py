@@ -0,0 +1,2 @@
+# test_endpoint.py is a manual script that posts to a running API, not a test
+collect_ignore = ['test_endpoint.py']
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from sklearn.model_selection import train_test_split
+from indicators import FEATURES
+
+# Sweeps lookback lengths and feature subsets for the training1 GRU. The full
+# scaled feature matrix and targets of a prepared dataset are placed in shared
+# memory once; worker processes attach to them and every configuration only
+# differs in how it views them: the lookback picks the window stride view and
+# the subset picks columns per batch. Every configuration predicts the same
+# targets, so their validation losses are directly comparable.
+#
+#   python experiment_runner.py [dataset version]
+
+LOOKBACKS = (10, 20, 30, 50)
+SUBSETS = {
+    'all': FEATURES,
+    'trend': ['MACD', 'Signal_Line', 'BB_Middle', 'BB_Upper', 'BB_Lower', 'Donchian_Upper', 'Donchian_Lower'],
+    'oscillators': ['RSI', 'Momentum', 'ROC', 'Stochastic', 'WilliamsR', 'CCI'],
+    'volatility': ['ATR', 'Std_Dev', 'CV', 'BB_Upper', 'BB_Lower'],
+    'no_volume': [name for name in FEATURES if name not in ('OBV', 'ADL')],
+}
+EPOCHS = 50
+PROFILE = 'cpu'  # training profile for batch size, learning rate and XLA; threads are split between workers
+RESULTS_PATH = os.path.join('experiments', 'results.csv')
+
+_shared = {}  # worker state: attached shared-memory blocks and the arrays over them
+
+
+def _share(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach(specs, max_lookback, train_idx, val_idx, threads):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    blocks = [[shared_memory.SharedMemory(name=name) for name, _, _ in pair] for pair in specs]
+    _shared.update(blocks=blocks, max_lookback=max_lookback, train_idx=train_idx, val_idx=val_idx)
+    _shared['series'] = [tuple(np.ndarray(shape, dtype, buffer=block.buf)
+                               for block, (_, shape, dtype) in zip(pair_blocks, pair))
+                         for pair_blocks, pair in zip(blocks, specs)]
+
+
+def _run(lookback, subset, columns):
+    from tensorflow.keras.callbacks import EarlyStopping
+    from training_profile import build_gru, get_profile
+    from window_dataset import WindowDataset
+
+    # Start each series later for shorter lookbacks, so every lookback predicts the same targets
+    offset = _shared['max_lookback'] - lookback
+    series = [(X[offset:], y[offset:]) for X, y in _shared['series']]
+    profile = get_profile(PROFILE)
+    kwargs = {'batch_size': profile['batch_size'], 'sequence_length': lookback, 'columns': columns, 'workers': 1}
+    train_data = WindowDataset(series, _shared['train_idx'], seed=42, **kwargs)
+    val_data = WindowDataset(series, _shared['val_idx'], shuffle=False, **kwargs)
+
+    started = time.perf_counter()
+    model = build_gru(train_data.window_shape, profile['learning_rate'], profile['jit_compile'])
+    history = model.fit(train_data, epochs=EPOCHS, validation_data=val_data, verbose=0,
+                        callbacks=[EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)])
+    return {'lookback': lookback, 'subset': subset, 'features': len(columns),
+            'val_loss': float(min(history.history['val_loss'])), 'epochs': len(history.history['val_loss']),
+            'seconds': round(time.perf_counter() - started, 1)}
+
+
+def run_experiments(series, features=FEATURES, lookbacks=LOOKBACKS, subsets=SUBSETS, n_jobs=None):
+    """Trains every (lookback, subset) pair in parallel and returns the results, best first.
+
+    series is a list of (X, y) pairs whose X columns are features, e.g. a
+    PreparedDataset's series. Call it from under `if __name__ == "__main__"`:
+    workers are spawned, which re-imports the calling script.
+    """
+    configs = [(lookback, name, [features.index(feature) for feature in subset])
+               for lookback in lookbacks for name, subset in subsets.items()]
+    n_jobs = min(n_jobs or os.cpu_count(), len(configs))
+    max_lookback = max(lookbacks)
+    from training_data import HORIZON
+    count = sum(len(X) - max_lookback - HORIZON for X, _ in series)
+    train_idx, val_idx = train_test_split(np.arange(count), test_size=0.2, random_state=42)
+
+    blocks, specs = [], []
+    try:
+        for X, y in series:
+            shared = [_share(np.asarray(X)), _share(np.asarray(y))]
+            blocks += [block for block, _ in shared]
+            specs.append([spec for _, spec in shared])
+        initargs = (specs, max_lookback, train_idx, val_idx, max(1, os.cpu_count() // n_jobs))
+        with ProcessPoolExecutor(n_jobs, mp_context=get_context('spawn'), initializer=_attach,
+                                 initargs=initargs) as pool:
+            futures = [pool.submit(_run, *config) for config in configs]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                print(results[-1])
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return pd.DataFrame(results).sort_values('val_loss').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from prepared_dataset import load_dataset
+
+    dataset = load_dataset(sys.argv[1] if len(sys.argv) > 1 else None)
+    results = run_experiments(dataset.series, dataset.features)
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    results.assign(dataset=dataset.version).to_csv(RESULTS_PATH, index=False)
+    print(results.to_string())
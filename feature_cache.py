@@ -0,0 +1,134 @@
+import os
+import atexit
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from candle_backfill import atomic_write
+from indicators import FEATURES, FEATURE_VERSION, compute_features
+
+# Content-addressed cache in front of the indicator engine. Entries are keyed
+# by a hash of the symbol, timeframe, candle range and contents, and the
+# indicator spec/version, so hyperparameter studies, backtests and retrains
+# over the same history skip feature computation. Recent matrices stay in
+# memory under a byte budget; least recently used ones spill to disk as .npy
+# files that are memory-mapped back on the next hit, and the spilled files are
+# in turn trimmed least recently used first to a disk budget.
+
+CACHE_DIR = 'feature_cache'
+MAX_MEMORY_BYTES = 512 * 1024 * 1024
+MAX_DISK_BYTES = 4 * 1024 * 1024 * 1024
+
+
+def feature_key(symbol, timeframe, data, dtype=np.float32, features=FEATURES):
+    """Hashes everything the feature matrix depends on into a cache key."""
+    digest = hashlib.blake2b(digest_size=20)
+    times = data['time'].astype('datetime64[ns, UTC]').to_numpy(dtype='datetime64[ns]').view(np.int64)
+    header = (symbol, timeframe, len(data), int(times[0]) if len(times) else None,
+              int(times[-1]) if len(times) else None, FEATURE_VERSION, np.dtype(dtype).str, tuple(features))
+    digest.update(repr(header).encode())
+    for column in ('high', 'low', 'close', 'tickVolume'):
+        digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)).tobytes())
+    digest.update(times.tobytes())
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """LRU feature-matrix cache bounded by bytes in memory, spilling to a bounded disk cache."""
+
+    def __init__(self, max_bytes=MAX_MEMORY_BYTES, root=CACHE_DIR, max_disk_bytes=MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.root = root
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.npy")
+
+    def _spill(self, key, array):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(path, lambda f: np.save(f, array))
+        self._trim_disk(keep=path)
+
+    def _trim_disk(self, keep):
+        """Deletes the least recently used spilled files until the rest fit max_disk_bytes."""
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.npy') and entry.path != keep:
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = os.path.getsize(keep) + sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            # Removing a file does not disturb memmaps still open on it
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get(self, key):
+        """Returns the cached matrix (read-only), or None on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        path = self._path(key)
+        if os.path.exists(path):
+            # Disk hits stay memory-mapped; the OS page cache keeps them warm.
+            array = np.load(path, mmap_mode='r')
+            os.utime(path)  # mtime orders the disk LRU
+            return array
+        return None
+
+    def put(self, key, array):
+        array.setflags(write=False)
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = array
+        self._bytes += array.nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._spill(evicted_key, evicted)
+        return array
+
+    def flush(self):
+        """Writes every in-memory entry to disk, e.g. before the process exits."""
+        for key, array in self._entries.items():
+            self._spill(key, array)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.endswith('.npy'):
+                    os.remove(os.path.join(self.root, name))
+
+    def features(self, symbol, timeframe, data, dtype=np.float32, features=FEATURES):
+        """Returns compute_features for a candle frame, computing it only on a miss."""
+        key = feature_key(symbol, timeframe, data, dtype, features)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        features = compute_features(data['high'], data['low'], data['close'], data['tickVolume'],
+                                    dtype=dtype, features=features)
+        return self.put(key, features)
+
+
+_default_cache = None
+
+
+def get_feature_cache():
+    """Process-wide cache shared by everything that imports this module."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FeatureCache()
+        # Persist what is still in memory so the next run starts from a warm disk cache.
+        atexit.register(_default_cache.flush)
+    return _default_cache
+
@@ -0,0 +1,124 @@
+import os
+import sys
+import shutil
+import hashlib
+import subprocess
+import tempfile
+import numpy as np
+import optuna
+from sklearn.model_selection import TimeSeriesSplit
+from sequences import sliding_windows, take_batch
+
+# Parallel Optuna search for the LSTM in templrpdewdr.py. Trials run in a pool
+# of worker processes sharing one SQLite study, so every core trains a model
+# at once. Each trial is scored on every TimeSeriesSplit fold and reports the
+# running mean fold loss after each one, which lets the pruner stop trials
+# that are already worse than the median after their first folds.
+
+STORAGE = 'sqlite:///optuna_lstm.db'
+N_SPLITS = 5
+SEARCH_EPOCHS = 10
+
+
+def _pruner():
+    # Pruners are not persisted with the study, so every worker builds the same one
+    return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1)
+
+
+def build_model(units_1, units_2, learning_rate, input_shape):
+    from keras.models import Sequential
+    from keras.layers import LSTM, Dense
+    from keras.optimizers import Adam
+
+    model = Sequential([
+        LSTM(units_1, return_sequences=True, input_shape=input_shape),
+        LSTM(units_2),
+        Dense(1)
+    ])
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+def _objective(X_lstm, y_lstm):
+    def objective(trial):
+        units_1 = trial.suggest_int('units_1', 30, 100)
+        units_2 = trial.suggest_int('units_2', 30, 100)
+        learning_rate = trial.suggest_float('learning_rate', 1e-5, 1e-2, log=True)
+        batch_size = trial.suggest_int('batch_size', 16, 128)
+
+        losses = []
+        for fold, (train_idx, test_idx) in enumerate(TimeSeriesSplit(n_splits=N_SPLITS).split(X_lstm)):
+            model = build_model(units_1, units_2, learning_rate, X_lstm.shape[1:])
+            model.fit(take_batch(X_lstm, train_idx), y_lstm[train_idx],
+                      epochs=SEARCH_EPOCHS, batch_size=batch_size, verbose=0)
+            losses.append(model.evaluate(take_batch(X_lstm, test_idx), y_lstm[test_idx], verbose=0))
+            trial.report(float(np.mean(losses)), fold)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        return float(np.mean(losses))
+    return objective
+
+
+def study_key(X, y, time_window):
+    """Names the study after its data and settings, so only a repeated search resumes it."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr((time_window, N_SPLITS, SEARCH_EPOCHS)).encode())
+    for values in (X, y):
+        values = np.ascontiguousarray(values)
+        digest.update(repr((values.shape, values.dtype.str)).encode())
+        digest.update(values.tobytes())
+    return f"lstm-{digest.hexdigest()}"
+
+
+def _worker(data_dir, time_window, study_name, storage, n_trials, threads):
+    # Runs in its own interpreter: split the cores between the workers
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    X_lstm, y_lstm = sliding_windows(X, time_window, y, count=min(len(X), len(y)) - time_window)
+    study = optuna.load_study(study_name=study_name, storage=storage, pruner=_pruner())
+    study.optimize(_objective(X_lstm, y_lstm.reshape(-1, 1)), n_trials=n_trials)
+
+
+def run_search(X, y, time_window, n_trials=50, n_jobs=None, study_name=None, storage=STORAGE):
+    """Runs n_trials over n_jobs processes (default: one per core) and returns the study.
+
+    X is the (samples, features) matrix and y the per-row targets, windowed
+    as in templrpdewdr.py. The study lives in storage under study_name,
+    which defaults to study_key(X, y, time_window): an interrupted or
+    repeated search on the same data adds to its trials, while new data or
+    another time_window starts a fresh study rather than mixing in stale
+    losses.
+    """
+    study_name = study_name or study_key(X, y, time_window)
+    n_jobs = min(n_jobs or os.cpu_count(), n_trials)
+    study = optuna.create_study(study_name=study_name, storage=storage, direction='minimize',
+                                pruner=_pruner(), load_if_exists=True)
+
+    # Workers memory-map the data instead of each receiving a pickled copy
+    data_dir = tempfile.mkdtemp(prefix='optuna_data_')
+    try:
+        np.save(os.path.join(data_dir, 'X.npy'), np.asarray(X))
+        np.save(os.path.join(data_dir, 'y.npy'), np.asarray(y))
+        shares = [n_trials // n_jobs + (i < n_trials % n_jobs) for i in range(n_jobs)]
+        threads = max(1, os.cpu_count() // n_jobs)
+        # Workers are fresh interpreters running this module rather than
+        # multiprocessing children: forking after TensorFlow is imported is
+        # unsafe, and spawn would re-run the calling script's top level.
+        workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), data_dir, str(time_window),
+                                     study_name, storage, str(share), str(threads)])
+                   for share in shares]
+        failed = [worker.args for worker in workers if worker.wait() != 0]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {n_jobs} search workers failed")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return study
+
+
+if __name__ == "__main__":
+    data_dir, time_window, study_name, storage, n_trials, threads = sys.argv[1:7]
+    _worker(data_dir, int(time_window), study_name, storage, int(n_trials), int(threads))
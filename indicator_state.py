@@ -0,0 +1,198 @@
+import math
+import pickle
+from collections import deque
+import numpy as np
+from candle_backfill import atomic_write
+from indicators import FEATURES
+
+# Streaming counterpart of indicators.compute_features for the live trader.
+# Each new candle updates EMA recurrences, running window sums, monotonic
+# deques for the rolling extremes and the cumulative OBV, so producing the
+# feature row for one bar costs the same whatever the history length. The
+# whole state pickles to disk so a restarted trader resumes without warmup.
+
+STATE_VERSION = 2
+RESYNC_INTERVAL = 1024  # bars between exact re-summations of the running windows
+
+
+class RollingWindow:
+    """Fixed-size window with running sum and sum of squares."""
+
+    def __init__(self, size, center=0.0):
+        self.size = size
+        self.center = center  # Values are shifted by this to keep the sum of squares well conditioned
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.squares = 0.0
+        self.updates = 0
+        self.last = math.nan
+        self.repeats = 0  # trailing run of equal values; a window of one value is exact, as in pandas
+
+    def push(self, value):
+        self.repeats = self.repeats + 1 if value == self.last else 1
+        self.last = value
+        value -= self.center
+        if len(self.values) == self.size:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.squares -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.squares += value * value
+        self.updates += 1
+        if self.updates % RESYNC_INTERVAL == 0:
+            # Running add/remove accumulates rounding error; re-sum exactly now and then.
+            self.total = math.fsum(self.values)
+            self.squares = math.fsum(v * v for v in self.values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        if not self.full:
+            return math.nan
+        if self.repeats >= self.size:
+            return self.last
+        return self.total / self.size + self.center
+
+    def std(self):
+        """Sample standard deviation (ddof=1)."""
+        if not self.full:
+            return math.nan
+        if self.repeats >= self.size:
+            return 0.0
+        variance = (self.squares - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingExtreme:
+    """Rolling max (or min) over the last `size` values via a monotonic deque."""
+
+    def __init__(self, size, maximum=True):
+        self.size = size
+        self.sign = 1 if maximum else -1
+        self.candidates = deque()  # (index, signed value), signed values decreasing
+        self.index = -1
+
+    def push(self, value):
+        self.index += 1
+        signed = self.sign * value
+        while self.candidates and self.candidates[-1][1] <= signed:
+            self.candidates.pop()
+        self.candidates.append((self.index, signed))
+        while self.candidates[0][0] <= self.index - self.size:
+            self.candidates.popleft()
+
+    def value(self):
+        return self.sign * self.candidates[0][1] if self.index >= self.size - 1 else math.nan
+
+
+class Ema:
+    """pandas ewm(span=span, adjust=False) recurrence."""
+
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+
+    def push(self, value):
+        self.value = value if self.value is None else self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class IndicatorState:
+    """O(1)-per-bar state producing the same FEATURES row as compute_features."""
+
+    def __init__(self, keep=30):
+        self.rows = deque(maxlen=keep)  # most recent feature rows, e.g. the model's input window
+        self.count = 0
+        self.last_time = None
+        self.prev_close = None
+        self.closes = deque(maxlen=15)  # for Momentum (4 bars back) and ROC (14 bars back)
+        self.ema_12, self.ema_26, self.signal = Ema(12), Ema(26), Ema(9)
+        self.close_20 = self.close_14 = None  # created on the first bar, centered on its close
+        self.gain_14, self.loss_14, self.move_14 = RollingWindow(14), RollingWindow(14), RollingWindow(14)
+        self.high_14, self.low_14 = RollingExtreme(14), RollingExtreme(14, maximum=False)
+        self.high_20, self.low_20 = RollingExtreme(20), RollingExtreme(20, maximum=False)
+        self.obv = math.nan
+
+    def update(self, high, low, close, volume, time=None):
+        """Adds one closed candle and returns its FEATURES row as a float64 array."""
+        if self.close_20 is None:
+            self.close_20, self.close_14 = RollingWindow(20, close), RollingWindow(14, close)
+        diff = close - self.prev_close if self.prev_close is not None else math.nan
+
+        self.close_20.push(close)
+        self.close_14.push(close)
+        # As in the batch engine, the first bar's missing diff counts as 0 for RSI but not for ATR.
+        self.gain_14.push(diff if diff > 0 else 0.0)
+        self.loss_14.push(diff if diff < 0 else 0.0)
+        if self.count > 0:
+            self.move_14.push(abs(diff))
+        for extreme, value in ((self.high_14, high), (self.high_20, high), (self.low_14, low), (self.low_20, low)):
+            extreme.push(value)
+        self.closes.append(close)
+        if self.count > 0:
+            self.obv = (0.0 if math.isnan(self.obv) else self.obv) + float(np.sign(diff)) * volume
+
+        macd = self.ema_12.push(close) - self.ema_26.push(close)
+        mean_20, std_20 = self.close_20.mean(), self.close_20.std()
+        mean_14, std_14 = self.close_14.mean(), self.close_14.std()
+        highest_14, lowest_14 = self.high_14.value(), self.low_14.value()
+        close_4 = self.closes[-5] if len(self.closes) >= 5 else math.nan
+        close_14 = self.closes[-15] if len(self.closes) >= 15 else math.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain, loss = np.float64(self.gain_14.mean()), -np.float64(self.loss_14.mean())
+            range_14, bar_range = np.float64(highest_14 - lowest_14), np.float64(high - low)
+            row = {
+                'MACD': macd,
+                'Signal_Line': self.signal.push(macd),
+                'RSI': 100 - (100 / (1 + gain / loss)),
+                'BB_Middle': mean_20,
+                'BB_Upper': mean_20 + 2 * std_20,
+                'BB_Lower': mean_20 - 2 * std_20,
+                'ATR': self.move_14.mean() if self.move_14.full else math.nan,
+                'Momentum': close - close_4,
+                'ROC': (close - close_14) / np.float64(close_14) * 100,
+                'Stochastic': (close - lowest_14) / range_14 * 100,
+                'WilliamsR': (highest_14 - close) / range_14 * -100,
+                'CCI': (close - mean_20) / (0.015 * np.float64(std_20)),
+                'CV': std_14 / np.float64(mean_14),
+                'Donchian_Upper': self.high_20.value(),
+                'Donchian_Lower': self.low_20.value(),
+                'Std_Dev': std_14,
+                'OBV': self.obv,
+                'ADL': ((close - low) - (high - close)) / bar_range * volume,
+            }
+        self.prev_close = close
+        self.count += 1
+        self.last_time = time
+        row = np.array([row[name] for name in FEATURES], dtype=np.float64)
+        self.rows.append(row)
+        return row
+
+    def update_frame(self, data):
+        """Feeds every candle of a frame (skipping any already seen) and returns their feature rows."""
+        if self.last_time is not None:
+            data = data[data['time'] > self.last_time]
+        rows = [self.update(row.high, row.low, row.close, row.tickVolume, row.time)
+                for row in data[['time', 'high', 'low', 'close', 'tickVolume']].itertuples(index=False)]
+        return np.array(rows).reshape(-1, len(FEATURES))
+
+    def save(self, path):
+        """Snapshots the state so a restart can resume without warmup."""
+        atomic_write(path, lambda f: pickle.dump({'version': STATE_VERSION, 'state': self}, f))
+
+    @staticmethod
+    def load(path):
+        """Loads a snapshot, or returns None if it is missing or from another version."""
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return snapshot['state'] if snapshot.get('version') == STATE_VERSION else None
+
@@ -0,0 +1,258 @@
+import math
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.signal import lfilter
+
+# Shared indicator engine for training, live trading and backtesting. Each
+# feature and shared primitive (20/14-bar mean and std, 14/20-bar extremes,
+# the close diff, the EMAs) is a registry node declaring its inputs and
+# lookback, so a model's feature list resolves to just the nodes it needs,
+# each computed once, and to the exact history it needs to warm up. Results
+# match the original pandas compute_indicators (rolling std with ddof=1,
+# ewm with adjust=False, NaN during warmup).
+
+FEATURES = [
+    'MACD', 'Signal_Line', 'RSI', 'BB_Middle', 'BB_Upper', 'BB_Lower', 'ATR', 'Momentum', 'ROC',
+    'Stochastic', 'WilliamsR', 'CCI', 'CV', 'Donchian_Upper', 'Donchian_Lower', 'Std_Dev', 'OBV', 'ADL',
+]
+FEATURE_VERSION = 2  # bump whenever a formula changes so cached feature matrices are invalidated
+
+
+def _window_sums(values, window):
+    """Trailing-window sums via cumulative sums; windows touching a NaN are NaN."""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < window:
+        return out
+    sums = np.zeros(n + 1)
+    missing = np.isnan(values)
+    if missing.any():
+        np.cumsum(np.where(missing, 0, values), out=sums[1:])
+        counts = np.concatenate(([0], np.cumsum(missing)))
+        out[window - 1:] = sums[window:] - sums[:n - window + 1]
+        out[window - 1:][counts[window:] != counts[:n - window + 1]] = np.nan
+    else:
+        np.cumsum(values, out=sums[1:])
+        out[window - 1:] = sums[window:] - sums[:n - window + 1]
+    return out
+
+
+def _constant_windows(values, window):
+    """Rows whose trailing window holds one repeated value.
+
+    pandas special-cases these (mean is the value, std is 0), while window sums
+    leave rounding residue that turns e.g. CCI's 0 / 0 into +-inf.
+    """
+    n = len(values)
+    rows = np.arange(n)
+    # NaN != NaN, so a run never spans a NaN
+    starts = np.concatenate(([True], values[1:] != values[:-1])) if n else np.empty(0, dtype=bool)
+    run_start = np.maximum.accumulate(np.where(starts, rows, 0)) if n else rows
+    return rows - run_start + 1 >= window
+
+
+def rolling_mean(values, window):
+    mean = _window_sums(values, window) / window
+    constant = _constant_windows(values, window)
+    mean[constant] = values[constant]
+    return mean
+
+
+def rolling_std(values, window):
+    """Sample standard deviation (ddof=1), as pandas rolling().std()."""
+    # Centering on the series mean keeps the sum-of-squares form well conditioned.
+    centered = values - np.nanmean(values) if len(values) else values
+    sums = _window_sums(centered, window)
+    variance = _window_sums(np.square(centered), window)
+    variance -= np.square(sums) / window
+    variance /= window - 1
+    variance[_constant_windows(values, window)] = 0
+    return np.sqrt(np.maximum(variance, 0, out=variance), out=variance)
+
+
+def _rolling_extreme(values, window, extreme_filter):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        # origin shifts the filter so each output covers the trailing window ending at that row
+        out[window - 1:] = extreme_filter(values, window, origin=(window - 1) // 2)[window - 1:]
+    return out
+
+
+def rolling_max(values, window):
+    return _rolling_extreme(values, window, maximum_filter1d)
+
+
+def rolling_min(values, window):
+    return _rolling_extreme(values, window, minimum_filter1d)
+
+
+def ema(values, span):
+    """Exponential moving average, as pandas ewm(span=span, adjust=False).mean()."""
+    alpha = 2 / (span + 1)
+    if not len(values):
+        return np.empty(0)
+    result, _ = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+    return result
+
+
+def shift(values, periods):
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+EMA_TOLERANCE = 1e-3  # an EMA counts as warmed up once its seed's weight drops below this
+
+
+def ema_warmup(span):
+    """Bars until the seed of an adjust=False EMA weighs less than EMA_TOLERANCE."""
+    return math.ceil(math.log(EMA_TOLERANCE) / math.log(1 - 2 / (span + 1)))
+
+
+class Node:
+    """One step of the feature graph: an array computed from other nodes.
+
+    lookback is how many bars past the warmup of its inputs the node needs
+    before its values are valid (window - 1 for a rolling window).
+    """
+
+    def __init__(self, name, inputs, compute, lookback=0):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+        self.lookback = lookback
+
+
+INPUTS = ('high', 'low', 'close', 'volume')
+REGISTRY = {}
+
+
+def register(name, inputs, lookback=0):
+    def decorator(compute):
+        REGISTRY[name] = Node(name, tuple(inputs), compute, lookback)
+        return compute
+    return decorator
+
+
+# Shared primitives, each computed at most once per call
+@register('diff', ['close'], lookback=1)
+def _diff(close):
+    diff = np.empty(len(close))
+    diff[:1] = np.nan
+    diff[1:] = np.diff(close)
+    return diff
+
+
+# where(diff > 0, 0) in pandas turns the leading NaN into 0, so RSI warms up one bar earlier than ATR
+@register('up_move', ['close'])
+def _up_move(close):
+    return np.concatenate(([0], np.maximum(np.diff(close), 0))) if len(close) else close
+
+
+@register('down_move', ['close'])
+def _down_move(close):
+    return np.concatenate(([0], np.minimum(np.diff(close), 0))) if len(close) else close
+
+
+register('gain_14', ['up_move'], lookback=13)(lambda up: rolling_mean(up, 14))
+register('loss_14', ['down_move'], lookback=13)(lambda down: -rolling_mean(down, 14))
+register('mean_20', ['close'], lookback=19)(lambda close: rolling_mean(close, 20))
+register('std_20', ['close'], lookback=19)(lambda close: rolling_std(close, 20))
+register('mean_14', ['close'], lookback=13)(lambda close: rolling_mean(close, 14))
+register('std_14', ['close'], lookback=13)(lambda close: rolling_std(close, 14))
+register('highest_14', ['high'], lookback=13)(lambda high: rolling_max(high, 14))
+register('lowest_14', ['low'], lookback=13)(lambda low: rolling_min(low, 14))
+register('range_14', ['highest_14', 'lowest_14'])(lambda highest, lowest: highest - lowest)
+register('ema_12', ['close'], lookback=ema_warmup(12))(lambda close: ema(close, 12))
+register('ema_26', ['close'], lookback=ema_warmup(26))(lambda close: ema(close, 26))
+
+# Model features
+register('MACD', ['ema_12', 'ema_26'])(lambda fast, slow: fast - slow)
+register('Signal_Line', ['MACD'], lookback=ema_warmup(9))(lambda macd: ema(macd, 9))
+register('RSI', ['gain_14', 'loss_14'])(lambda gain, loss: 100 - (100 / (1 + gain / loss)))
+register('BB_Middle', ['mean_20'])(lambda mean: mean)
+register('BB_Upper', ['mean_20', 'std_20'])(lambda mean, std: mean + 2 * std)
+register('BB_Lower', ['mean_20', 'std_20'])(lambda mean, std: mean - 2 * std)
+register('ATR', ['diff'], lookback=13)(lambda diff: rolling_mean(np.abs(diff), 14))
+register('Momentum', ['close'], lookback=4)(lambda close: close - shift(close, 4))
+register('ROC', ['close'], lookback=14)(lambda close: (close - shift(close, 14)) / shift(close, 14) * 100)
+register('Stochastic', ['close', 'highest_14', 'lowest_14', 'range_14'])(
+    lambda close, highest, lowest, range_: (close - lowest) / range_ * 100)
+register('WilliamsR', ['close', 'highest_14', 'lowest_14', 'range_14'])(
+    lambda close, highest, lowest, range_: (highest - close) / range_ * -100)
+register('CCI', ['close', 'mean_20', 'std_20'])(lambda close, mean, std: (close - mean) / (0.015 * std))
+register('CV', ['std_14', 'mean_14'])(lambda std, mean: std / mean)
+register('Donchian_Upper', ['high'], lookback=19)(lambda high: rolling_max(high, 20))
+register('Donchian_Lower', ['low'], lookback=19)(lambda low: rolling_min(low, 20))
+register('Std_Dev', ['std_14'])(lambda std: std)
+register('ADL', ['high', 'low', 'close', 'volume'])(
+    lambda high, low, close, volume: ((close - low) - (high - close)) / (high - low) * volume)
+
+
+# OBV is cumulative: its level depends on where the history starts, so no
+# amount of warmup makes it match a longer series, only its bar-to-bar moves.
+@register('OBV', ['diff', 'volume'])
+def _obv(diff, volume):
+    # pandas cumsum skips the leading NaN but keeps it in place
+    obv = np.cumsum(np.nan_to_num(np.sign(diff) * volume))
+    obv[:1] = np.nan
+    return obv
+
+
+def plan(features):
+    """Returns the registry nodes needed for features, inputs before the nodes using them."""
+    order, seen = [], set(INPUTS)
+
+    def visit(name):
+        if name in seen:
+            return
+        if name not in REGISTRY:
+            raise ValueError(f"Unknown feature: {name}")
+        seen.add(name)
+        for dependency in REGISTRY[name].inputs:
+            visit(dependency)
+        order.append(REGISTRY[name])
+
+    for name in features:
+        visit(name)
+    return order
+
+
+def warmup(features):
+    """Leading bars before every one of features is valid."""
+    bars = dict.fromkeys(INPUTS, 0)
+    for node in plan(features):
+        bars[node.name] = node.lookback + max(bars[name] for name in node.inputs)
+    return max((bars[name] for name in features), default=0)
+
+
+def required_history(features, sequence_length=1):
+    """Minimum number of candles for sequence_length fully warmed-up feature rows."""
+    return warmup(features) + sequence_length
+
+
+def compute_features(high, low, close, volume, out=None, dtype=np.float32, features=FEATURES):
+    """Computes features (all FEATURES by default) into an (n, len(features)) matrix.
+
+    Only the part of the registry the requested features depend on is
+    evaluated, and every shared primitive once. out is reused if given.
+    """
+    values = dict(zip(INPUTS, (np.asarray(v, dtype=np.float64) for v in (high, low, close, volume))))
+    if out is None:
+        out = np.empty((len(values['close']), len(features)), dtype=dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for node in plan(features):
+            values[node.name] = node.compute(*(values[name] for name in node.inputs))
+    for j, name in enumerate(features):
+        out[:, j] = values[name]
+    return out
+
+
+def compute_indicators(data, features=FEATURES):
+    """Adds the features columns to a candle frame and returns it."""
+    values = compute_features(data['high'], data['low'], data['close'], data['tickVolume'],
+                              dtype=np.float64, features=features)
+    for j, name in enumerate(features):
+        data[name] = values[:, j]
+    return data
@@ -1,47 +1,160 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 import tensorflow as tf
 import numpy as np
 from pydantic import BaseModel
 from keras.saving import register_keras_serializable
 import joblib
+import model_registry
+
+# Concurrent /predict requests are coalesced: windows are queued and run as
+# one batched forward pass once MAX_BATCH_SIZE windows are waiting or the
+# oldest has waited MAX_WAIT_MS, and each caller gets its own row back.
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE') or 32)
+MAX_WAIT_MS = float(os.getenv('MAX_WAIT_MS') or 5)
+# Batches run through one compiled function, padded to the next of these sizes
+# so only a few shapes are ever traced; all of them are warmed at startup.
+BATCH_SIZES = tuple(sorted({2 ** i for i in range(MAX_BATCH_SIZE.bit_length()) if 2 ** i < MAX_BATCH_SIZE}
+                           | {MAX_BATCH_SIZE}))
+JIT_COMPILE = os.getenv('SERVING_XLA') == '1'  # XLA-compile the serving function
 
 # Register custom loss function if needed
 @register_keras_serializable()
 def mse(y_true, y_pred):
     return tf.keras.losses.mean_squared_error(y_true, y_pred)
 
-# Load the trained model with custom objects
+# Load the live model version with custom objects; it is served until restart
 custom_objects = {'mse': mse}
-model = tf.keras.models.load_model("gru_model.keras", custom_objects=custom_objects)
-y_scaler = joblib.load('y_scaler.pkl')
+manifest = model_registry.current_manifest()
+MODEL_VERSION = manifest['version'] if manifest else None
+model = tf.keras.models.load_model(model_registry.live_path(model_registry.MODEL_PATH, manifest),
+                                   custom_objects=custom_objects)
+y_scaler = joblib.load(model_registry.live_path('y_scaler.pkl', manifest))
+WINDOW_SHAPE = tuple(model.input_shape[1:])  # (30, 18)
+
+
+@tf.function(input_signature=[tf.TensorSpec((None,) + WINDOW_SHAPE, tf.float32)], jit_compile=JIT_COMPILE)
+def serve(windows):
+    return model(windows, training=False)
+
+
+def predict_windows(windows):
+    """Predictions in price units for a (batch, 30, 18) array of scaled windows."""
+    size = next((size for size in BATCH_SIZES if size >= len(windows)), len(windows))
+    padded = np.zeros((size,) + WINDOW_SHAPE, dtype=np.float32)
+    padded[:len(windows)] = windows
+    prediction = serve(tf.constant(padded)).numpy()[:len(windows)]
+    return y_scaler.inverse_transform(prediction.reshape(-1, 1))[:, 0]
+
+
+def warm_up():
+    """Traces (and with XLA compiles) serve for every batch size, so no request pays for it."""
+    started = time.perf_counter()
+    for size in BATCH_SIZES:
+        predict_windows(np.zeros((size,) + WINDOW_SHAPE, dtype=np.float32))
+    print(f"Serving function warmed for batch sizes {BATCH_SIZES} in {time.perf_counter() - started:.1f}s"
+          f"{' (XLA)' if JIT_COMPILE else ''}.")
+
+
+warm_up()
+
+
+class MicroBatcher:
+    """Coalesces concurrent submit() calls into batched predict_batch calls."""
+
+    def __init__(self, predict_batch, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self._task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def submit(self, window):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((window, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+            except asyncio.TimeoutError:
+                break
+        # Callers that went away (e.g. disconnected) no longer need a result
+        return [(window, future) for window, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            windows = np.stack([window for window, _ in batch])
+            try:
+                # Off the event loop, so requests keep queueing up for the next batch meanwhile
+                predictions = await asyncio.to_thread(self.predict_batch, windows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(prediction)
+
+
+batcher = MicroBatcher(predict_windows)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await batcher.start()
+    yield
+    await batcher.stop()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Define request body schema
 class PredictionRequest(BaseModel):
     features: list
 
 @app.post("/predict")
-def predict(data: PredictionRequest):
+async def predict(data: PredictionRequest):
     try:
         # Convert input data to NumPy array
         features = np.array(data.features, dtype=np.float32)
 
         # Ensure input is reshaped correctly
-        features = features.reshape(1, 30, 18)  # Match model's expected input shape
-        
-        # Perform inference
-        prediction = model.predict(features)
-        
-        # Inverse transform the prediction
-        prediction = y_scaler.inverse_transform(prediction.reshape(-1, 1))  # Ensure correct shape
-        
+        features = features.reshape(WINDOW_SHAPE)  # Match model's expected input shape
+
+        # Perform inference as part of a batch
+        prediction = await batcher.submit(features)
+
         # Return the prediction result
-        return {"prediction": float(prediction[0][0])}
+        return {"prediction": float(prediction), "version": MODEL_VERSION}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @app.get("/")
 def home():
     return {"message": "Forex LSTM Model API is running!"}
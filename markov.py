@@ -0,0 +1,98 @@
+import numpy as np
+from collections import deque
+
+# Markov-chain features over Up/Stable/Down price moves. States come from one
+# vectorized comparison and transitions are counted with bincount (whole
+# series) or a cumulative sum of one-hot transitions (rolling), so no step
+# loops over bars in Python. The rolling probabilities at bar t use only the
+# transitions completed by t, so they can be fed to a model, and
+# OnlineMarkov produces the same rows one bar at a time for live trading.
+
+# Same codes LabelEncoder gave the 'Down'/'Stable'/'Up' labels (sorted order)
+STATES = ('Down', 'Stable', 'Up')
+DOWN, STABLE, UP = range(len(STATES))
+N_STATES = len(STATES)
+THRESHOLD = 0.001  # price change beyond which a move counts as Up or Down
+
+
+def price_states(prices, threshold=THRESHOLD):
+    """State of every price change, i.e. len(prices) - 1 codes."""
+    changes = np.diff(np.asarray(prices, dtype=np.float64))
+    states = np.full(len(changes), STABLE, dtype=np.int8)
+    states[changes > threshold] = UP
+    states[changes < -threshold] = DOWN
+    return states
+
+
+def transition_counts(states):
+    """(N_STATES, N_STATES) counts of state i followed by state j."""
+    states = np.asarray(states, dtype=np.intp)
+    pairs = states[:-1] * N_STATES + states[1:]
+    return np.bincount(pairs, minlength=N_STATES * N_STATES).reshape(N_STATES, N_STATES)
+
+
+def transition_matrix(states):
+    """Row-normalized transition probabilities over the whole series (NaN for unseen states)."""
+    counts = transition_counts(states).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return counts / counts.sum(axis=1, keepdims=True)
+
+
+def markov_probs(states, matrix=None):
+    """Next-state probabilities for every state but the last, from one fixed matrix.
+
+    With the default matrix fitted on the same states this looks ahead; use
+    rolling_markov_probs for model features.
+    """
+    states = np.asarray(states, dtype=np.intp)
+    matrix = transition_matrix(states) if matrix is None else matrix
+    return matrix[states[:-1]]
+
+
+def rolling_markov_probs(states, window=None, prior=1.0):
+    """Next-state probabilities at every bar from the transitions seen so far.
+
+    Row t is P(next state | states[t]) estimated from the transitions that
+    completed at or before t: all of them, or the last window of them.
+    prior is added to every count (Laplace smoothing), so rows are uniform
+    before a state has been seen rather than NaN.
+    """
+    states = np.asarray(states, dtype=np.intp)
+    n = len(states)
+    # Transition i -> i + 1 is known once bar i + 1 has closed
+    completed = np.zeros((n, N_STATES * N_STATES))
+    completed[np.arange(1, n), states[:-1] * N_STATES + states[1:]] = 1
+    counts = np.cumsum(completed, axis=0)
+    if window is not None and n > window:
+        counts[window:] -= counts[:-window].copy()
+    counts = counts.reshape(n, N_STATES, N_STATES)[np.arange(n), states] + prior
+    return counts / counts.sum(axis=1, keepdims=True)
+
+
+class OnlineMarkov:
+    """Per-bar counterpart of rolling_markov_probs for the live trader."""
+
+    def __init__(self, window=None, threshold=THRESHOLD, prior=1.0):
+        self.threshold = threshold
+        self.prior = prior
+        self.counts = np.zeros((N_STATES, N_STATES))
+        self.transitions = deque(maxlen=window) if window is not None else None
+        self.prev_price = None
+        self.state = None
+
+    def update(self, price):
+        """Adds a closed bar's price; returns P(next state | current state), NaN for the first bar."""
+        if self.prev_price is None:
+            self.prev_price = price
+            return np.full(N_STATES, np.nan)
+        change = price - self.prev_price
+        state = UP if change > self.threshold else DOWN if change < -self.threshold else STABLE
+        if self.state is not None:
+            if self.transitions is not None:
+                if len(self.transitions) == self.transitions.maxlen:
+                    self.counts[self.transitions[0]] -= 1
+                self.transitions.append((self.state, state))
+            self.counts[self.state, state] += 1
+        self.prev_price, self.state = price, state
+        row = self.counts[state] + self.prior
+        return row / row.sum()
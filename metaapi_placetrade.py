@@ -1,15 +1,19 @@
 import os
 import asyncio
 import json
-import numpy as np
 import pandas as pd
 import requests
-from metaapi_cloud_sdk import MetaApi
-from datetime import datetime, timedelta, timezone
+from metaapi_session import MetaApiSession
+from candle_store import sync_historical_candles, drop_open_bar
+from price_stream import stream_bars
+from datetime import datetime
 from sklearn.preprocessing import MinMaxScaler
 import joblib
 import logging
 import aiocron
+from indicators import FEATURES, compute_indicators, required_history
+from indicator_state import IndicatorState
+import model_registry
 
 # Load credentials
 with open('settings.json', 'r') as file:
@@ -24,79 +28,46 @@ trailing_stop_pips = 15  # 15 pips trailing stop
 domain = settings.get('domain') or 'agiliumtrade.agiliumtrade.ai'
 TELEGRAM_BOT_TOKEN = settings.get('telegram_bot_token')
 TELEGRAM_CHAT_ID = settings.get('telegram_chat_id')
+# Build bars from live quotes instead of polling the candle history on a cron
+streaming = os.getenv('STREAMING') == '1' or settings.get('streaming', False)
+INDICATOR_STATE_PATH = f"indicator_state_{symbol}_4h.pkl"
+CLOSED_BAR_ATTEMPTS = 3  # downloads tried for the broker's candle of a bar that just closed
+CLOSED_BAR_RETRY_DELAY = 2  # seconds between them
+STREAM_RESTART_DELAY = 30  # seconds before a failed stream is started again
+SEQUENCE_LENGTH = 30  # rows per model input window
+# The scaler of the live model version, loaded once like the API loads the
+# model, so a publish mid-run never pairs a new scaler with the old model.
+MODEL_MANIFEST = model_registry.current_manifest()
+MODEL_VERSION = MODEL_MANIFEST['version'] if MODEL_MANIFEST else None
+X_scaler = joblib.load(model_registry.live_path('X_scaler.pkl', MODEL_MANIFEST))
+# Only the features the scaler (and so the model) was fitted on are computed,
+# and the history fetched is exactly what they need to warm up.
+FEATURE_COLUMNS = list(X_scaler.feature_names_in_)
+NUM_CANDLES = required_history(FEATURE_COLUMNS, SEQUENCE_LENGTH)
+
+# One warm account/RPC connection shared by candle retrieval and order placement
+session = MetaApiSession(token, account_id, domain)
 
 async def retrieve_historical_candles():
-    api = MetaApi(token, {'domain': domain})
-    account = await api.metatrader_account_api.get_account(account_id)
-
-    if account.state != 'DEPLOYED':
-        await account.deploy()
-    if account.connection_status != 'CONNECTED':
-        await account.wait_connected()
-
-    num_candles = 100  # Increase this to get more data
-    start_time = datetime.now(timezone.utc)
-    candles = []
-
-    while len(candles) < num_candles:
-        new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-        if not new_candles:
-            break
-        candles.extend(new_candles)
-        start_time = new_candles[0]['time'] - timedelta(hours=4)
-        if len(candles) >= num_candles:
-            break
-
-    data = pd.DataFrame(candles)
-
-    if not data.empty:
-        data = data[['time', 'open', 'high', 'low', 'close', 'tickVolume']]
-        data['time'] = pd.to_datetime(data['time'])
-    
-    print(f"Retrieved {len(data)} candles.")  # Debugging line
+    account = await session.get_account()
 
-    return data
+    # Closed bars come from the local store; only the newest bars are downloaded
+    data = await sync_historical_candles(account, symbol, '4h', NUM_CANDLES)
 
+    print(f"Retrieved {len(data)} candles.")  # Debugging line
 
-def compute_indicators(data):
-    
-    data['MACD'] = data['close'].ewm(span=12, adjust=False).mean() - data['close'].ewm(span=26, adjust=False).mean()
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-
-    data['BB_Middle'] = data['close'].rolling(window=20).mean()
-    data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-    data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-
-    data['RSI'] = 100 - (100 / (1 + (data['close'].diff(1).where(data['close'].diff(1) > 0, 0).rolling(window=14).mean() /
-                               -data['close'].diff(1).where(data['close'].diff(1) < 0, 0).rolling(window=14).mean())))
-
-    data['ATR'] = data['close'].diff().abs().rolling(window=14).mean()
-    data['Momentum'] = data['close'] - data['close'].shift(4)
-    data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
-    data['Stochastic'] = ((data['close'] - data['low'].rolling(window=14).min()) / 
-                      (data['high'].rolling(window=14).max() - data['low'].rolling(window=14).min())) * 100
-    data['WilliamsR'] = ((data['high'].rolling(14).max() - data['close']) / 
-                     (data['high'].rolling(14).max() - data['low'].rolling(14).min())) * -100
-    data['CCI'] = (data['close'] - data['close'].rolling(20).mean()) / (0.015 * data['close'].rolling(20).std())
-    data['CV'] = data['close'].rolling(window=14).std() / data['close'].rolling(window=14).mean()
-    data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-    data['Donchian_Lower'] = data['low'].rolling(window=20).min()
-    data['Std_Dev'] = data['close'].rolling(window=14).std()
-    data['OBV'] = (np.sign(data['close'].diff()) * data['tickVolume']).cumsum()
-    data['ADL'] = ((data['close'] - data['low']) - (data['high'] - data['close'])) / (data['high'] - data['low']) * data['tickVolume']
     return data
 
+
 def scale_features(data):
     """Scales the computed features using a pre-saved MinMaxScaler."""
     if len(data) < 30:
         raise ValueError(f"Insufficient data: Expected at least 30 rows, got {len(data)}")
 
-    X_scaler = joblib.load('X_scaler.pkl')
-    
     feature_columns = X_scaler.feature_names_in_
     
-    # Fill NaN values with 0 to avoid issues
-    data = data[feature_columns].fillna(0)
+    # Fill NaN values with 0 to avoid issues; match the precision the scaler was fitted in
+    data = data[feature_columns].fillna(0).astype(X_scaler.data_min_.dtype)
     
     # Ensure correct feature shape before transforming
     scaled_data = X_scaler.transform(data[-30:])
@@ -109,6 +80,11 @@ def send_to_fastapi(data):
     response = requests.post(prediction_url, json={'features': data.tolist()})
     print("FastAPI Response:", response.json())  # Debugging line
 
+    version = response.json().get('version')
+    if version != MODEL_VERSION:
+        # Features scaled for one version are meaningless to another; restart both after a publish
+        logging.error(f"API serves model version {version} but features were scaled for {MODEL_VERSION}.")
+        return None
     return response.json().get('prediction')
 
 def send_telegram_message(message): 
@@ -136,15 +112,8 @@ PIP_VALUE = 0.0001  # Adjust if using JPY pairs (0.01)
 
 async def place_trade(predicted_price):
     """Places a trade based on the predicted price using MetaAPI."""
-    api = MetaApi(token)
-    account = await api.metatrader_account_api.get_account(account_id)
-    await account.deploy()
-    await account.wait_connected()
-    connection = account.get_rpc_connection()
-    await connection.connect()
-    await connection.wait_synchronized()
-    
-    latest_price = await connection.get_symbol_price(symbol)
+    latest_price = await session.call('get_symbol_price', symbol)
+    connection = await session.get_connection()
     entry_price = latest_price['ask'] if predicted_price > latest_price['ask'] else latest_price['bid']
     trade_direction = 'buy' if predicted_price > latest_price['ask'] else 'sell'
     
@@ -180,13 +149,14 @@ async def place_trade(predicted_price):
     print(f'Trade executed: {trade_direction} at {entry_price}, SL: {stop_loss}, TP: {take_profit}, result: {result}')
 
 
-async def main():
-    """Main function to execute trading logic."""
-    print(f"Running trade execution at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+async def run_strategy(data):
+    """Computes features on the candle window, gets a prediction and trades on it."""
+    data = compute_indicators(data, FEATURE_COLUMNS)
+    await trade_on_features(data)
 
-    data = await retrieve_historical_candles()
-    data = compute_indicators(data)
-    
+
+async def trade_on_features(data):
+    """Scales the latest 30 feature rows, gets a prediction and trades on it."""
     print(f"Data shape after computing indicators: {data.shape}")
 
     # Ensure there are at least 30 rows before scaling
@@ -205,8 +175,70 @@ async def main():
     else:
         print("No valid prediction received.")
 
-# Schedule execution every 4 hours at 5 minutes past (11:05 PM, 3:05 AM, etc.)
-aiocron.crontab("5 23,3,7,11,15,19 * * *", func=main)
+
+async def main():
+    """Main function to execute trading logic."""
+    print(f"Running trade execution at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    data = await retrieve_historical_candles()
+    await run_strategy(data)
+
+
+async def stream():
+    """Streaming mode: trades as soon as each 4h bar closes, timed by live quotes."""
+    data = await retrieve_historical_candles()
+    history = drop_open_bar(data, '4h')
+    forming_bar = data.iloc[-1].to_dict() if len(history) < len(data) else None
+
+    # Resume the indicator state from its snapshot when it lines up with the
+    # history (catching up on any bars missed while down); else warm it up.
+    state = IndicatorState.load(INDICATOR_STATE_PATH)
+    if state is None or state.last_time is None or state.last_time < history['time'].iloc[0]:
+        state = IndicatorState()
+    state.update_frame(history)
+    state.save(INDICATOR_STATE_PATH)
+
+    # A streamed bar only signals the close. Its tickVolume counts quotes, not
+    # the broker volume ADL/OBV are built on, so the state is fed the broker's
+    # closed candles, which also catches up on any bar missed in between.
+    async def on_bar_closed(bar):
+        print(f"Bar closed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: {bar}")
+        for attempt in range(CLOSED_BAR_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(CLOSED_BAR_RETRY_DELAY)
+            # One O(1) update per new bar instead of recomputing every indicator over the window
+            state.update_frame(drop_open_bar(await retrieve_historical_candles(), '4h'))
+            if state.last_time >= bar['time']:
+                break
+        state.save(INDICATOR_STATE_PATH)
+        if state.last_time < bar['time']:
+            logging.warning(f"No broker candle for the {bar['time']} bar yet; not trading on it")
+            return
+        await trade_on_features(pd.DataFrame(list(state.rows), columns=FEATURES))
+
+    await stream_bars(session, symbol, '4h', on_bar_closed, history['time'].iloc[-1], forming_bar)
+
+
+async def supervise_stream():
+    """Runs stream(), starting it again whenever it fails, so trading never stops silently."""
+    while True:
+        try:
+            await stream()
+        except Exception as e:
+            logging.error(f"Streaming failed: {str(e)}; restarting in {STREAM_RESTART_DELAY}s")
+            await asyncio.sleep(STREAM_RESTART_DELAY)
+
+
+loop = asyncio.get_event_loop()
+
+if streaming:
+    loop.create_task(supervise_stream())
+else:
+    # Schedule execution every 4 hours at 5 minutes past (11:05 PM, 3:05 AM, etc.)
+    aiocron.crontab("5 23,3,7,11,15,19 * * *", func=main)
+
+    # Warm the MetaApi session now so the first scheduled run does not pay for it
+    loop.create_task(session.connect())
 
 # Keep the script running indefinitely
-asyncio.get_event_loop().run_forever()
+loop.run_forever()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import random
+from metaapi_cloud_sdk import MetaApi
+from candle_backfill import is_transient
+
+# Process-wide MetaApi session. The account is deployed and the RPC connection
+# synchronized once, then reused for candle retrieval and order placement, so
+# the live trader only pays the connection cost at startup or after a drop.
+
+RECONNECT_DELAY = 1  # seconds, doubled after every failed attempt
+MAX_RECONNECT_DELAY = 60
+MAX_RECONNECT_ATTEMPTS = 6
+
+
+class MetaApiSession:
+    """Keeps one deployed account and one synchronized RPC connection warm."""
+
+    def __init__(self, token, account_id, domain=None):
+        self.token = token
+        self.account_id = account_id
+        self.domain = domain
+        self.api = None
+        self.account = None
+        self.connection = None
+        self.streaming_connection = None
+        self._lock = asyncio.Lock()
+
+    async def _connect_once(self):
+        if self.api is None:
+            self.api = MetaApi(self.token, {'domain': self.domain} if self.domain else None)
+        self.account = await self.api.metatrader_account_api.get_account(self.account_id)
+        if self.account.state != 'DEPLOYED':
+            await self.account.deploy()
+        if self.account.connection_status != 'CONNECTED':
+            await self.account.wait_connected()
+        self.connection = self.account.get_rpc_connection()
+        await self.connection.connect()
+        await self.connection.wait_synchronized()
+
+    async def connect(self):
+        """Connects with exponential backoff; a no-op while the session is already up."""
+        async with self._lock:
+            if self.connection is not None:
+                return
+            delay = RECONNECT_DELAY
+            for attempt in range(1, MAX_RECONNECT_ATTEMPTS + 1):
+                try:
+                    await self._connect_once()
+                    logging.info("MetaApi session connected.")
+                    return
+                except Exception as e:
+                    self.connection = None
+                    if attempt == MAX_RECONNECT_ATTEMPTS:
+                        raise
+                    logging.warning(f"MetaApi connect attempt {attempt} failed: {e}; retrying in {delay}s")
+                    await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _detach(self):
+        """Forgets both connections and returns them for closing."""
+        connections = [self.streaming_connection, self.connection]
+        self.streaming_connection = self.connection = None
+        return [connection for connection in connections if connection is not None]
+
+    @staticmethod
+    async def _close_all(connections):
+        for connection in connections:
+            try:
+                await connection.close()
+            except Exception as e:
+                logging.warning(f"Error closing MetaApi connection: {e}")
+
+    async def reconnect(self):
+        """Drops the current connections and establishes a new RPC connection.
+
+        The streaming connection shares the dropped link, so it is reopened by
+        the next get_streaming_connection().
+        """
+        async with self._lock:
+            connections = self._detach()
+        await self._close_all(connections)
+        await self.connect()
+
+    async def get_account(self):
+        await self.connect()
+        return self.account
+
+    async def get_connection(self):
+        await self.connect()
+        return self.connection
+
+    async def get_streaming_connection(self):
+        """Opens (once) a synchronized streaming connection on the same account."""
+        account = await self.get_account()
+        if self.streaming_connection is None:
+            connection = account.get_streaming_connection()
+            await connection.connect()
+            await connection.wait_synchronized()
+            self.streaming_connection = connection
+        return self.streaming_connection
+
+    async def call(self, method, *args, **kwargs):
+        """Calls an idempotent RPC method, reconnecting and retrying once if the connection dropped.
+
+        Only connection, timeout and server errors reconnect; any other error
+        (bad symbol, validation, ...) is raised as is. Order placement must
+        not go through here: a retry could submit the order twice.
+        """
+        connection = await self.get_connection()
+        try:
+            return await getattr(connection, method)(*args, **kwargs)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            logging.warning(f"MetaApi call {method} failed: {e}; reconnecting")
+            await self.reconnect()
+            return await getattr(self.connection, method)(*args, **kwargs)
+
+    async def close(self):
+        async with self._lock:
+            await self._close_all(self._detach())
@@ -0,0 +1,78 @@
+import os
+import json
+import pickle
+from datetime import datetime, timezone
+from candle_backfill import atomic_write
+
+# Versioned model publishing. Every trained model is kept under
+# models/<version>/ with the scalers it was trained with and a manifest
+# recording, per symbol, the last candle it has seen (the walk-forward
+# cut-off). The top-level model.json is the one pointer to the live version:
+# publishing writes the whole version directory first and then swaps
+# model.json in with a single os.replace, and readers resolve the model and
+# its scalers through one read of it, so they never pair files of two
+# versions or load a half-written one.
+
+MODELS_DIR = 'models'
+# File names inside a version directory; the top-level files of the same
+# names are the live model until the first one is published
+MODEL_PATH = 'gru_model.keras'
+SCALER_PATHS = ('X_scaler.pkl', 'y_scaler.pkl')
+MANIFEST_PATH = 'model.json'
+
+
+def current_manifest():
+    """Manifest of the live model, or None if nothing was published yet."""
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def live_path(name, manifest=None):
+    """Path of one of the live version's files (MODEL_PATH, a scaler, ...).
+
+    Pass the manifest already read when loading several files, so they all
+    come from the same version.
+    """
+    manifest = manifest or current_manifest()
+    return os.path.join(MODELS_DIR, manifest['version'], name) if manifest else name
+
+
+def publish_model(model, X_scaler, y_scaler, cutoffs, timeframe, parent=None, **details):
+    """Saves a model version with its scalers and makes it the live one; returns the version.
+
+    cutoffs maps symbol -> time of the last candle trained on.
+    """
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    directory = os.path.join(MODELS_DIR, version)
+    os.makedirs(directory, exist_ok=True)
+    model.save(os.path.join(directory, MODEL_PATH))
+    for path, scaler in zip(SCALER_PATHS, (X_scaler, y_scaler)):
+        with open(os.path.join(directory, path), 'wb') as f:
+            pickle.dump(scaler, f)
+    manifest = {
+        'version': version,
+        'parent': parent,
+        'timeframe': timeframe,
+        'cutoffs': {symbol: str(cutoff) for symbol, cutoff in cutoffs.items()},
+        **details,
+    }
+    with open(os.path.join(directory, MANIFEST_PATH), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # The version is complete on disk; pointing model.json at it is the publish
+    atomic_write(MANIFEST_PATH, lambda f: json.dump(manifest, f, indent=2), 'w')
+    print(f"Published model version {version}.")
+    return version
+
+
+def load_scalers(manifest=None):
+    """The live (or manifest's) X and y scalers."""
+    manifest = manifest or current_manifest()
+    scalers = []
+    for path in SCALER_PATHS:
+        with open(live_path(path, manifest), 'rb') as f:
+            scalers.append(pickle.load(f))
+    return tuple(scalers)
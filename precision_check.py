@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import training_data
+import feature_cache
+from candle_store import CandleStore
+
+# Memory benchmark and precision regression check for the float32 training
+# path against the float64 one. Runs on the stored candles of SYMBOL/TIMEFRAME
+# when there are any, else on a synthetic random walk:
+#
+#   python precision_check.py [num_bars]
+
+TOLERANCE = 1e-5  # max abs difference allowed in scaled ([0, 1]) features and targets
+
+
+def synthetic_candles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-3, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return pd.DataFrame({
+        'time': pd.date_range('2015-01-01', periods=n, freq='4h', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 1e-3, n),
+        'low': np.minimum(open_, close) - rng.uniform(0, 1e-3, n),
+        'close': close,
+        'tickVolume': rng.integers(1, 5000, n).astype(float),
+    })
+
+
+def run(data, dtype):
+    # A fresh, never-spilling cache so every run pays for its own feature computation
+    feature_cache._default_cache = feature_cache.FeatureCache(max_bytes=float('inf'))
+    tracemalloc.start()
+    started = time.perf_counter()
+    X, y, _, _ = training_data.prepare_data(data, 'CHECK', '4h', dtype=dtype)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return X, y, peak, elapsed
+
+
+if __name__ == "__main__":
+    symbol = os.getenv('SYMBOL') or 'EURUSD'
+    timeframe = os.getenv('TIMEFRAME') or '4h'
+    num_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = CandleStore(symbol, timeframe).load()
+    if len(data) < 1000:
+        print(f"No stored {symbol} {timeframe} candles, using a synthetic series.")
+        data = synthetic_candles(num_bars)
+    data = data.iloc[-num_bars:].reset_index(drop=True)
+
+    X64, y64, peak64, elapsed64 = run(data, np.float64)
+    X32, y32, peak32, elapsed32 = run(data, np.float32)
+
+    print(f"{len(data)} bars -> X {X32.shape}")
+    for name, X, peak, elapsed in (('float64', X64, peak64, elapsed64), ('float32', X32, peak32, elapsed32)):
+        # X is a strided view; nbytes is what materializing every window would take
+        print(f"{name}: X {X.nbytes / 2**20:8.1f} MiB materialized, peak {peak / 2**20:8.1f} MiB, {elapsed:.2f}s")
+
+    x_error = np.abs(X32.astype(np.float64) - X64).max()
+    y_error = np.abs(y32.astype(np.float64) - y64).max()
+    print(f"max abs error: X {x_error:.2e}, y {y_error:.2e} (tolerance {TOLERANCE:.0e})")
+    if x_error > TOLERANCE or y_error > TOLERANCE:
+        sys.exit("float32 path drifted from the float64 path")
@@ -0,0 +1,115 @@
+import os
+import json
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+import training_data
+from candle_backfill import atomic_write
+from feature_cache import feature_key
+from indicators import FEATURES, FEATURE_VERSION
+
+# Prepared training datasets as versioned artifacts. build_dataset turns
+# candles into datasets/<version>/ holding each symbol's scaled feature matrix
+# and targets as .npy files, the fitted X/y scalers and a manifest (feature
+# names, dtype, source candle range per symbol). The version is a hash of
+# everything that goes in, so rebuilding from unchanged candles is a no-op,
+# and PreparedDataset opens an artifact lazily: memmaps and scalers are only
+# read when first used, so training can start from a cached dataset at once.
+
+DATASET_ROOT = 'datasets'
+MANIFEST = 'manifest.json'
+LATEST = 'latest'
+
+
+def dataset_version(candles, timeframe, dtype=training_data.PRECISION, features=FEATURES):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr((timeframe, training_data.SEQUENCE_LENGTH, training_data.HORIZON)).encode())
+    for symbol in sorted(candles):
+        digest.update(feature_key(symbol, timeframe, candles[symbol], dtype, features).encode())
+    return digest.hexdigest()
+
+
+def build_dataset(candles, timeframe, dtype=training_data.PRECISION, features=FEATURES, root=DATASET_ROOT):
+    """Writes (or reuses) the dataset artifact for candles and returns it opened."""
+    version = dataset_version(candles, timeframe, dtype, features)
+    path = os.path.join(root, version)
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+        _, X_scaler, y_scaler = training_data.build_series(candles, timeframe, dtype, features, root=path)
+        for name, scaler in (('X_scaler.pkl', X_scaler), ('y_scaler.pkl', y_scaler)):
+            with open(os.path.join(path, name), 'wb') as f:
+                pickle.dump(scaler, f)
+        manifest = {
+            'version': version,
+            'created': datetime.now(timezone.utc).isoformat(),
+            'timeframe': timeframe,
+            'dtype': np.dtype(dtype).name,
+            'features': list(features),
+            'feature_version': FEATURE_VERSION,
+            'sequence_length': training_data.SEQUENCE_LENGTH,
+            'horizon': training_data.HORIZON,
+            'symbols': {symbol: {'start': str(data['time'].iloc[0]), 'end': str(data['time'].iloc[-1]),
+                                 'candles': len(data)}
+                        for symbol, data in candles.items()},
+        }
+        # The manifest is written last and marks the artifact complete
+        atomic_write(os.path.join(path, MANIFEST), lambda f: json.dump(manifest, f, indent=2), 'w')
+    atomic_write(os.path.join(root, LATEST), lambda f: f.write(version), 'w')
+    return PreparedDataset(path)
+
+
+def load_dataset(version=None, root=DATASET_ROOT):
+    """Opens a dataset artifact, by default the most recently built one."""
+    if version is None:
+        with open(os.path.join(root, LATEST)) as f:
+            version = f.read().strip()
+    return PreparedDataset(os.path.join(root, version))
+
+
+class PreparedDataset:
+    """A dataset artifact; its arrays and scalers are loaded on first access."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self._series = None
+        self._scalers = {}
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def features(self):
+        return self.manifest['features']
+
+    @property
+    def cutoffs(self):
+        """Time of the last candle of every symbol."""
+        return {symbol: pd.Timestamp(info['end']) for symbol, info in self.manifest['symbols'].items()}
+
+    @property
+    def series(self):
+        """[(X, y), ...] per symbol, memory-mapped read-only."""
+        if self._series is None:
+            timeframe = self.manifest['timeframe']
+            self._series = [tuple(np.load(os.path.join(self.path, f"{symbol}_{timeframe}_{name}.npy"), mmap_mode='r')
+                                  for name in ('X', 'y'))
+                            for symbol in self.manifest['symbols']]
+        return self._series
+
+    def _scaler(self, name):
+        if name not in self._scalers:
+            with open(os.path.join(self.path, name), 'rb') as f:
+                self._scalers[name] = pickle.load(f)
+        return self._scalers[name]
+
+    @property
+    def X_scaler(self):
+        return self._scaler('X_scaler.pkl')
+
+    @property
+    def y_scaler(self):
+        return self._scaler('y_scaler.pkl')
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import pandas as pd
+from datetime import datetime, timezone
+from metaapi_cloud_sdk import SynchronizationListener
+from candle_backfill import timeframe_to_timedelta
+from resample import SESSION_ALIGNMENT, WEEKEND_GAP
+
+# Real-time bar building for the live trader. Quotes arrive over the MetaApi
+# streaming connection, a local aggregator folds them into the current bar and
+# fires a "bar closed" callback as soon as the bar's time is up, so the
+# strategy no longer waits for a cron tick and a history download.
+
+CLOSE_CHECK_INTERVAL = 0.05  # seconds between checks for a bar that closed without a new tick
+
+
+class BarAggregator:
+    """Builds OHLC/tickVolume bars of one timeframe from a stream of prices."""
+
+    def __init__(self, timeframe, on_bar_closed, anchor):
+        self.step = pd.Timedelta(timeframe_to_timedelta(timeframe))
+        # Bars are aligned to the broker's session, so bucket boundaries are
+        # measured from a known candle time rather than from the epoch.
+        self.anchor = pd.Timestamp(anchor)
+        self.last_time = self.anchor
+        self.on_bar_closed = on_bar_closed
+        self.bar = None
+
+    def bar_start(self, time):
+        return self.anchor + ((pd.Timestamp(time) - self.anchor) // self.step) * self.step
+
+    def seed(self, candle):
+        """Continues a bar that was already forming before the stream started."""
+        self.bar = {column: candle[column] for column in ('time', 'open', 'high', 'low', 'close', 'tickVolume')}
+        self.bar['time'] = pd.Timestamp(candle['time'])
+
+    async def _close(self):
+        bar, self.bar = self.bar, None
+        try:
+            await self.on_bar_closed(bar)
+        except Exception as e:
+            # Handled like a bad quote: logged, and the stream goes on to the next bar
+            logging.error(f"Error handling closed bar {bar['time']}: {str(e)}")
+
+    async def update(self, time, price, volume=1):
+        """Folds one price into the current bar, closing the previous bar if time moved past it."""
+        time = pd.Timestamp(time)
+        if time - self.last_time > WEEKEND_GAP:
+            # A new trading week: its open re-anchors the bars, as in resample_candles, so DST shifts carry over
+            self.anchor = time.floor(min(SESSION_ALIGNMENT, self.step))
+        self.last_time = time
+        start = self.bar_start(time)
+        if self.bar is not None and start > self.bar['time']:
+            await self._close()
+        if self.bar is None:
+            self.bar = {'time': start, 'open': price, 'high': price, 'low': price, 'close': price, 'tickVolume': volume}
+            return
+        self.bar['high'] = max(self.bar['high'], price)
+        self.bar['low'] = min(self.bar['low'], price)
+        self.bar['close'] = price
+        self.bar['tickVolume'] += volume
+
+    async def check_close(self, now=None):
+        """Closes the current bar once its time is up, even if no new tick has arrived."""
+        now = pd.Timestamp(now or datetime.now(timezone.utc))
+        if self.bar is not None and now >= self.bar['time'] + self.step:
+            await self._close()
+
+
+class PriceStreamListener(SynchronizationListener):
+    """Forwards bid quotes for one symbol into a BarAggregator."""
+
+    def __init__(self, symbol, aggregator):
+        super().__init__()
+        self.symbol = symbol
+        self.aggregator = aggregator
+
+    async def on_symbol_price_updated(self, instance_index, price):
+        if price.get('symbol') != self.symbol:
+            return
+        try:
+            await self.aggregator.update(price['time'], price['bid'])
+        except Exception as e:
+            logging.error(f"Error handling price update for {self.symbol}: {str(e)}")
+
+
+async def stream_bars(session, symbol, timeframe, on_bar_closed, last_bar_time, forming_bar=None):
+    """Subscribes to the symbol's quotes and calls on_bar_closed(bar) for every closed bar.
+
+    last_bar_time is the time of the last closed history bar, which anchors
+    the bar grid until the next week open. forming_bar is the still-open
+    candle from the latest history download; it seeds the aggregator so the
+    first streamed bar has the right open/high/low.
+    """
+    aggregator = BarAggregator(timeframe, on_bar_closed,
+                               anchor=forming_bar['time'] if forming_bar is not None else last_bar_time)
+    if forming_bar is not None:
+        aggregator.seed(forming_bar)
+
+    connection = await session.get_streaming_connection()
+    listener = PriceStreamListener(symbol, aggregator)
+    connection.add_synchronization_listener(listener)
+    try:
+        await connection.subscribe_to_market_data(symbol, [{'type': 'quotes'}])
+        logging.info(f"Streaming {symbol} quotes into {timeframe} bars.")
+
+        while True:
+            await aggregator.check_close()
+            await asyncio.sleep(CLOSE_CHECK_INTERVAL)
+    finally:
+        # Once stopped, quotes must not keep closing bars of this aggregator
+        connection.remove_synchronization_listener(listener)
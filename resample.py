@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from candle_buffer import CandleBuffer
+from candle_backfill import timeframe_to_timedelta
+from candle_store import CandleStore
+
+# Derives higher timeframes (H2/H3/H4/H6/D1...) from a stored base timeframe,
+# so only the finest timeframe has to be downloaded. Bars are aligned to each
+# trading week's open, the same way the broker builds them, which keeps the
+# buckets right across DST shifts and never lets a bar span a weekend gap.
+
+WEEKEND_GAP = pd.Timedelta(hours=36)  # Longer than any intraday gap, shorter than a weekend
+SESSION_ALIGNMENT = pd.Timedelta(hours=1)  # Sessions open on the hour
+
+
+def _bucket_starts(times, step):
+    """Returns the start of the target bar each base bar falls into (all int64 ns)."""
+    week_starts = np.flatnonzero(np.diff(times) > WEEKEND_GAP.value) + 1
+    if len(week_starts):
+        segment = np.zeros(len(times), dtype=np.int64)
+        segment[week_starts] = 1
+        segment = np.cumsum(segment)
+        # Bars before the first weekend in the data align to the following week's open.
+        anchors = times[np.concatenate(([week_starts[0]], week_starts))]
+        alignment = min(SESSION_ALIGNMENT.value, step)
+        anchors = anchors - anchors % alignment
+        anchor = anchors[segment]
+    else:
+        anchor = np.zeros(len(times), dtype=np.int64)
+    return anchor + (times - anchor) // step * step
+
+
+def resample_candles(data, base_timeframe, timeframe, complete_only=True):
+    """Aggregates a base-timeframe candle frame into a higher timeframe.
+
+    open is the first open, high/low the extremes, close the last close and
+    tickVolume the sum of each bucket. With complete_only the first and last
+    bars are dropped when the base data starts after or ends before them.
+    """
+    base_step = pd.Timedelta(timeframe_to_timedelta(base_timeframe)).value
+    step = pd.Timedelta(timeframe_to_timedelta(timeframe)).value
+    if step % base_step:
+        raise ValueError(f"{timeframe} is not a multiple of {base_timeframe}")
+    if data.empty:
+        return data.copy()
+
+    times = data['time'].astype('datetime64[ns, UTC]').to_numpy(dtype='datetime64[ns]').view(np.int64)
+    buckets = _bucket_starts(times, step)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(times)])) - 1
+
+    buffer = CandleBuffer.from_arrays(
+        time=buckets[starts],
+        open=data['open'].to_numpy()[starts],
+        high=np.maximum.reduceat(data['high'].to_numpy(), starts),
+        low=np.minimum.reduceat(data['low'].to_numpy(), starts),
+        close=data['close'].to_numpy()[ends],
+        tickVolume=np.add.reduceat(data['tickVolume'].to_numpy(dtype=np.float64), starts),
+    )
+    if complete_only:
+        keep = np.ones(len(buffer), dtype=bool)
+        keep[0] &= times[0] == buckets[0]
+        keep[-1] &= times[-1] + base_step >= buckets[-1] + step
+        buffer.select(keep)
+    return buffer.to_frame()
+
+
+def load_resampled(symbol, timeframe, base_timeframe='1h', root=None):
+    """Loads the stored base timeframe for a symbol and resamples it to timeframe."""
+    data = CandleStore(symbol, base_timeframe, root).load()
+    if timeframe == base_timeframe:
+        return data
+    return resample_candles(data, base_timeframe, timeframe)
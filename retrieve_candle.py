@@ -1,9 +1,10 @@
 import os
 import asyncio
 from metaapi_cloud_sdk import MetaApi
-from datetime import datetime, timedelta, timezone
+from candle_store import sync_many
+from datetime import datetime
 import json
-import pandas as pd  # Import pandas
+import logging
 
 # Load credentials from settings.json
 with open('settings.json', 'r') as file:
@@ -13,6 +14,9 @@ with open('settings.json', 'r') as file:
 token = settings.get('metaapi_access_token')
 account_id = settings.get('metaapi_accountid')
 symbol = os.getenv('SYMBOL') or 'EURUSD'
+# Comma-separated lists, e.g. SYMBOLS=EURUSD,GBPUSD,USDJPY TIMEFRAMES=1h,4h
+symbols = (os.getenv('SYMBOLS') or symbol).split(',')
+timeframes = (os.getenv('TIMEFRAMES') or '4h').split(',')
 domain = settings.get('domain') or 'agiliumtrade.agiliumtrade.ai'  # Default to MetaApi domain
 
 async def retrieve_historical_candles():
@@ -36,38 +40,17 @@ async def retrieve_historical_candles():
 
         # Retrieve last 12,000 six-hour candles (~3.5 years of data)
         num_candles = 12000
-        print(f'Downloading {num_candles} latest H6 candles for {symbol}')
-        start_time = datetime.now(timezone.utc)  # Proper timezone-aware UTC datetime
-        # Start from current time
-        candles = []
-
+        print(f'Downloading {num_candles} latest {", ".join(timeframes)} candles for {", ".join(symbols)}')
         started_at = datetime.now().timestamp()
 
-        while len(candles) < num_candles:
-            # Retrieve historical candles
-            new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-
-            if not new_candles:
-                print(f'No more historical data available. Stopping.')
-                break
-
-            candles.extend(new_candles)
-            print(f'Downloaded {len(new_candles)} candles. Total so far: {len(candles)}')
-
-            # Update start_time for the next batch
-            start_time = new_candles[0]['time'] - timedelta(hours=4)
-
-            # Stop if we have enough data
-            if len(candles) >= num_candles:
-                candles = candles[:num_candles]  # Trim excess candles
-                break
-
-        if candles:
-            print(f'First candle: {candles[0]}')
-            print(f'Total retrieved: {len(candles)}')
+        # All symbols share the one account connection and download concurrently;
+        # only candles newer than the local store are downloaded
+        candles = await sync_many(account, symbols, timeframes, num_candles)
 
-        # Convert candles to DataFrame
-        data = pd.DataFrame(candles)
+        for (pair_symbol, timeframe), data in candles.items():
+            if not data.empty:
+                print(f'{pair_symbol} {timeframe} first candle: {data.iloc[0].to_dict()}')
+                print(f'{pair_symbol} {timeframe} total retrieved: {len(data)}')
 
         print(f'Execution time: {(datetime.now().timestamp() - started_at) * 1000:.2f} ms')
 
@@ -75,4 +58,5 @@ async def retrieve_historical_candles():
         print(api.format_error(err))
 
 # Run the function
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 asyncio.run(retrieve_historical_candles())
\ No newline at end of file
@@ -0,0 +1,44 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Sliding-window model inputs without copying. sliding_windows returns a
+# read-only strided view of shape (count, window, features) over the feature
+# matrix, so window i is just features[i:i + window] seen through the view's
+# strides; nothing is copied until a batch is actually taken.
+
+
+def sliding_windows(features, window, targets=None, count=None):
+    """Returns windows features[i:i + window] for i < count, and targets[i + window].
+
+    count defaults to len(features) - window, i.e. every window that has a
+    following row to predict. The windows and targets are views; use
+    take_batch or iter_batches to materialize contiguous batches.
+    """
+    features = np.asarray(features)
+    if count is None:
+        count = len(features) - window
+    count = max(count, 0)
+    if len(features) < window:
+        windows = np.empty((0, window) + features.shape[1:], dtype=features.dtype)
+    else:
+        # sliding_window_view appends the window axis last; move it next to the sample axis
+        windows = np.moveaxis(sliding_window_view(features, window, axis=0), -1, 1)[:count]
+    if targets is None:
+        return windows
+    return windows, np.asarray(targets)[window:window + count]
+
+
+def take_batch(windows, indices):
+    """Copies the selected windows into one contiguous (len(indices), window, features) array."""
+    return np.ascontiguousarray(windows[indices])
+
+
+def iter_batches(windows, targets=None, batch_size=256, indices=None):
+    """Yields contiguous batches (with their targets) one at a time, in indices order."""
+    indices = np.arange(len(windows)) if indices is None else np.asarray(indices)
+    for start in range(0, len(indices), batch_size):
+        batch = indices[start:start + batch_size]
+        if targets is None:
+            yield take_batch(windows, batch)
+        else:
+            yield take_batch(windows, batch), targets[batch]
@@ -1,18 +1,16 @@
 import MetaTrader5 as mt5
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-from sklearn.model_selection import TimeSeriesSplit
-from keras.models import Sequential
-from keras.layers import LSTM, Dense
+from sklearn.preprocessing import MinMaxScaler
 from keras.callbacks import EarlyStopping
-from keras.optimizers import Adam
 from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error
-import optuna
-import shap
 import datetime
 import math
 import matplotlib.pyplot as plt
+from sequences import sliding_windows
+import markov
+from hyperparameter_search import build_model, run_search
+import explain
 
 # Step 1: Connect to MT5 and Fetch Data
 def fetch_data(symbol, timeframe, n_candles):
@@ -37,37 +35,11 @@ print(f"Fetched {len(prices)} rows of EUR/USD data.")
 
 # Step 2: Calculate Price Changes and Define Markov States
 price_changes = np.diff(prices)
-price_states = []
-threshold = 0.001
-
-for change in price_changes:
-    if change > threshold:
-        price_states.append("Up")
-    elif change < -threshold:
-        price_states.append("Down")
-    else:
-        price_states.append("Stable")
-
-state_encoder = LabelEncoder()
-state_encoded = state_encoder.fit_transform(price_states)
-
-n_states = len(set(price_states))
-transition_matrix = np.zeros((n_states, n_states))
-for i in range(len(state_encoded) - 1):
-    current_state = state_encoded[i]
-    next_state = state_encoded[i + 1]
-    transition_matrix[current_state, next_state] += 1
-
-transition_matrix = transition_matrix / transition_matrix.sum(axis=1, keepdims=True)
-
-# Generate Markov Probabilities
-markov_probs = []
-for i in range(len(state_encoded) - 1):
-    current_state = state_encoded[i]
-    probs = transition_matrix[current_state]
-    markov_probs.append(probs)
-
-markov_probs = np.array(markov_probs)
+state_encoded = markov.price_states(prices)
+
+# Generate Markov Probabilities from the transitions seen up to each bar, so
+# the features never use future moves
+markov_probs = markov.rolling_markov_probs(state_encoded)[:-1]
 
 # Step 3: Add Technical Indicators
 data['SMA_10'] = data['close'].rolling(window=10).mean()
@@ -118,13 +90,12 @@ prices = data['close'].values
 # Step 4: Preprocess Data
 scaler = MinMaxScaler()
 scaled_prices = scaler.fit_transform(prices.reshape(-1, 1))
-scaled_features = [
-    scaler.fit_transform(data[col].values.reshape(-1, 1)) for col in [
-        'EMA_10', 'SMA_10', 'RSI', 'MACD', 'Signal_Line',
-        'BB_Upper', 'BB_Lower', 'ATR', 'Stochastic',
-        'Donchian_Upper', 'Donchian_Lower', 'Std_Dev', 'ROC'
-    ]
+feature_columns = [
+    'EMA_10', 'SMA_10', 'RSI', 'MACD', 'Signal_Line',
+    'BB_Upper', 'BB_Lower', 'ATR', 'Stochastic',
+    'Donchian_Upper', 'Donchian_Lower', 'Std_Dev', 'ROC'
 ]
+scaled_features = [scaler.fit_transform(data[col].values.reshape(-1, 1)) for col in feature_columns]
 # Ensure all arrays have the same length
 min_length = min(
     len(scaled_prices), len(markov_probs),
@@ -138,48 +109,25 @@ scaled_features = [feature[:min_length] for feature in scaled_features]
 
 # Combine all features
 X = np.hstack([scaled_prices, markov_probs] + scaled_features)
+feature_names = ['close'] + [f"P_{state}" for state in markov.STATES] + feature_columns
 y = price_changes[1:]
 
 # Create LSTM time-series data
 time_window = 50
-X_lstm, y_lstm = [], []
-for i in range(len(X) - time_window):
-    X_lstm.append(X[i:i + time_window])
-    y_lstm.append(y[i + time_window])
-
-X_lstm = np.array(X_lstm)
-y_lstm = np.array(y_lstm).reshape(-1, 1)
+# Strided views over X; folds and batches copy only the windows they select
+X_lstm, y_lstm = sliding_windows(X, time_window, y, count=min(len(X), len(y)) - time_window)
+y_lstm = y_lstm.reshape(-1, 1)
 
-# Step 5: TimeSeriesSplit for Validation
-tscv = TimeSeriesSplit(n_splits=5)
+# Step 5: TimeSeriesSplit for Validation (see hyperparameter_search.py)
 
 # Step 5.5: Split data globally for final model training
 train_size = int(0.8 * len(X_lstm))  # 80% of the data for training
 X_train, X_test = X_lstm[:train_size], X_lstm[train_size:]
 y_train, y_test = y_lstm[:train_size], y_lstm[train_size:]
 
-def objective(trial):
-    units_1 = trial.suggest_int('units_1', 30, 100)
-    units_2 = trial.suggest_int('units_2', 30, 100)
-    learning_rate = trial.suggest_loguniform('learning_rate', 1e-5, 1e-2)
-    batch_size = trial.suggest_int('batch_size', 16, 128)
-
-    for train_idx, test_idx in tscv.split(X_lstm):
-        X_train, X_test = X_lstm[train_idx], X_lstm[test_idx]
-        y_train, y_test = y_lstm[train_idx], y_lstm[test_idx]
-
-        model = Sequential([
-            LSTM(units_1, return_sequences=True, input_shape=(time_window, X.shape[1])),
-            LSTM(units_2),
-            Dense(1)
-        ])
-        model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
-        model.fit(X_train, y_train, epochs=10, batch_size=batch_size, verbose=0)
-        loss = model.evaluate(X_test, y_test, verbose=0)
-        return loss
-
-study = optuna.create_study(direction='minimize')
-study.optimize(objective, n_trials=50)
+# Trials run in parallel worker processes sharing a SQLite study; each one is
+# scored on all folds and pruned early when it trails the median
+study = run_search(X, y, time_window, n_trials=50)
 print(f"Best Parameters: {study.best_params}")
 
 
@@ -187,30 +135,26 @@ print(f"Best Parameters: {study.best_params}")
 units_1, units_2 = study.best_params['units_1'], study.best_params['units_2']
 learning_rate, batch_size = study.best_params['learning_rate'], study.best_params['batch_size']
 
-model = Sequential([
-    LSTM(units_1, return_sequences=True, input_shape=(time_window, X.shape[1])),
-    LSTM(units_2),
-    Dense(1)
-])
-model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+model = build_model(units_1, units_2, learning_rate, (time_window, X.shape[1]))
 
 early_stopping = EarlyStopping(monitor='val_loss', patience=6, restore_best_weights=True)
 model.fit(X_train, y_train, epochs=50, batch_size=batch_size, validation_data=(X_test, y_test), callbacks=[early_stopping])
 
 
-# Step 7: SHAP Explainability
-# Reshape X_train and X_test to 2D for SHAP (flatten time series data)
-X_train_2D = X_train.reshape(X_train.shape[0], -1)  # Flatten (samples, time_steps * features)
-X_test_2D = X_test.reshape(X_test.shape[0], -1)
-
-# Create SHAP explainer
-explainer = shap.KernelExplainer(lambda x: model.predict(x.reshape(-1, time_window, X.shape[1])), X_train_2D[:100])
+# Step 7: Explainability
+# Integrated gradients over every test window in batched gradient calls,
+# cached per model version, instead of KernelExplainer on flattened windows
+version = explain.model_version(model)
+attributions = explain.explain(model, X_test, version)
+per_feature, per_timestep = explain.aggregate(attributions, feature_names)
+explain.record_importance(version, per_feature)
+print(f"Feature importance (mean |attribution|, model {version}):\n{per_feature}")
 
-# Compute SHAP values for a subset of X_test
-shap_values = explainer.shap_values(X_test_2D[:10])
-
-# Plot SHAP summary
-shap.summary_plot(shap_values, X_test_2D[:10])
+fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+per_feature.sort_values().plot.barh(ax=axes[0], title='Importance per feature')
+per_timestep.plot(ax=axes[1], title='Importance per timestep (oldest first)')
+plt.tight_layout()
+plt.show()
 
 
 # Step 8: Evaluate Model
@@ -1,11 +1,13 @@
 import os
 import asyncio
 from metaapi_cloud_sdk import MetaApi
-from datetime import datetime, timedelta, timezone
+from candle_store import sync_historical_candles
+from indicators import FEATURES, compute_indicators
+import markov
 import json
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
+from sklearn.preprocessing import MinMaxScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 import matplotlib.pyplot as plt
@@ -29,18 +31,7 @@ async def retrieve_historical_candles():
         await account.wait_connected()
     
     num_candles = 15000
-    start_time = datetime.now(timezone.utc)
-    candles = []
-    while len(candles) < num_candles:
-        new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-        if not new_candles:
-            break
-        candles.extend(new_candles)
-        start_time = new_candles[0]['time'] - timedelta(hours=3)
-        if len(candles) >= num_candles:
-            candles = candles[:num_candles]
-            break
-    return pd.DataFrame(candles)
+    return await sync_historical_candles(account, symbol, '4h', num_candles)
 
 data = asyncio.run(retrieve_historical_candles())
 data['time'] = pd.to_datetime(data['time'])
@@ -48,68 +39,12 @@ prices = data['close'].values
 
 # Compute price changes
 price_changes = np.diff(prices)
-price_states = ['Up' if change > 0.001 else 'Down' if change < -0.001 else 'Stable' for change in price_changes]
-state_encoder = LabelEncoder()
-state_encoded = state_encoder.fit_transform(price_states)
-n_states = len(set(price_states))
-transition_matrix = np.zeros((n_states, n_states))
-for i in range(len(state_encoded) - 1):
-    transition_matrix[state_encoded[i], state_encoded[i + 1]] += 1
-transition_matrix = transition_matrix / transition_matrix.sum(axis=1, keepdims=True)
+state_encoded = markov.price_states(prices)
+transition_matrix = markov.transition_matrix(state_encoded)
 
-import numpy as np
-import pandas as pd
-
-# Assuming 'data' is your DataFrame with 'close', 'high', 'low', and 'tick_volume' columns
-
-data['MACD'] = data['close'].ewm(span=12, adjust=False).mean() - data['close'].ewm(span=26, adjust=False).mean()
-data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-
-data['BB_Middle'] = data['close'].rolling(window=20).mean()
-data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-
-data['RSI'] = 100 - (100 / (1 + (data['close'].diff(1).where(data['close'].diff(1) > 0, 0).rolling(window=14).mean() /
-                               -data['close'].diff(1).where(data['close'].diff(1) < 0, 0).rolling(window=14).mean())))
-
-data['ATR'] = data['close'].diff().abs().rolling(window=14).mean()
-data['Momentum'] = data['close'] - data['close'].shift(4)
-data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
-data['Stochastic'] = ((data['close'] - data['low'].rolling(window=14).min()) / 
-                      (data['high'].rolling(window=14).max() - data['low'].rolling(window=14).min())) * 100
-data['WilliamsR'] = ((data['high'].rolling(14).max() - data['close']) / 
-                     (data['high'].rolling(14).max() - data['low'].rolling(14).min())) * -100
-data['CCI'] = (data['close'] - data['close'].rolling(20).mean()) / (0.015 * data['close'].rolling(20).std())
-data['CV'] = data['close'].rolling(window=14).std() / data['close'].rolling(window=14).mean()
-data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-data['Donchian_Lower'] = data['low'].rolling(window=20).min()
-data['Std_Dev'] = data['close'].rolling(window=14).std()
-data['OBV'] = (np.sign(data['close'].diff()) * data['volume']).cumsum()
-data['ADL'] = ((data['close'] - data['low']) - (data['high'] - data['close'])) / (data['high'] - data['low']) * data['volume']
-
-indicators = {
-    'MACD': data['MACD'],
-    'Signal_Line': data['Signal_Line'],
-    'RSI': data['RSI'],
-    'BB_Middle': data['BB_Middle'],
-    'BB_Upper': data['BB_Upper'],
-    'BB_Lower': data['BB_Lower'],
-    'ATR': data['ATR'],
-    'Momentum': data['Momentum'],
-    'ROC': data['ROC'],
-    'Stochastic': data['Stochastic'],
-    'WilliamsR': data['WilliamsR'],
-    'CCI': data['CCI'],
-    'CV': data['CV'],
-    'Donchian_Upper': data['Donchian_Upper'],
-    'Donchian_Lower': data['Donchian_Lower'],
-    'Std_Dev': data['Std_Dev'],
-    'OBV': data['OBV'],
-    'ADL': data['ADL']
-}
-
-# List of indicators
-indicators = list(indicators.keys())
+# Indicators from the shared engine (MetaApi candles carry 'tickVolume', not 'volume')
+compute_indicators(data)
+indicators = FEATURES
 
 scaler = MinMaxScaler()
 scaled_features = scaler.fit_transform(data[indicators].dropna())
@@ -129,6 +64,7 @@ from tensorflow.keras.layers import Conv1D, MaxPooling1D, BatchNormalization
 from tensorflow.keras.layers import Bidirectional, GRU, Dropout, Dense, Input, Multiply, Permute, Reshape, Lambda
 from tensorflow.keras.regularizers import l2
 import tensorflow.keras.backend as K
+from training_checkpoint import TrainingCheckpoint
 
 # **Custom Attention Layer**
 def attention_block(inputs):
@@ -176,20 +112,26 @@ x = Dense(32, activation='relu')(x)
 output_layer = Dense(1, activation='linear')(x)
 
 # **Create Model**
-model = Model(inputs=input_layer, outputs=output_layer)
+# Checkpointed every epoch; RESUME=1 continues an interrupted run from its latest checkpoint
+checkpoint = TrainingCheckpoint('cnn_bigru_attention')
+model = checkpoint.load_model()
+if model is None:
+    model = Model(inputs=input_layer, outputs=output_layer)
 
-# **Compile the Model**
-model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0005),
-              loss='mse',
-              metrics=['mse', 'mae'])
+    # **Compile the Model**
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0005),
+                  loss='mse',
+                  metrics=['mse', 'mae'])
 
 # **Train the Model**
 history = model.fit(X_train, y_train, 
                     epochs=50, 
+                    initial_epoch=checkpoint.initial_epoch,
                     batch_size=128, 
                     validation_data=(X_test, y_test), 
                     verbose=1, 
-                    shuffle=False)
+                    shuffle=False,
+                    callbacks=[checkpoint])
 
 
 model.save('forex_gru_model.h5')
@@ -1,15 +1,16 @@
 import os
 import asyncio
 import json
-import numpy as np
-import pandas as pd
 import requests
 from metaapi_cloud_sdk import MetaApi
-from datetime import datetime, timedelta, timezone
+from candle_store import sync_historical_candles
+from datetime import datetime
 from sklearn.preprocessing import MinMaxScaler
 import joblib
 import logging
 import aiocron
+from indicators import compute_indicators
+import model_registry
 
 # Load credentials
 with open('settings.json', 'r') as file:
@@ -35,63 +36,19 @@ async def retrieve_historical_candles():
         await account.wait_connected()
 
     num_candles = 100  # Increase this to get more data
-    start_time = datetime.now(timezone.utc)
-    candles = []
-
-    while len(candles) < num_candles:
-        new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-        if not new_candles:
-            break
-        candles.extend(new_candles)
-        start_time = new_candles[0]['time'] - timedelta(hours=4)
-        if len(candles) >= num_candles:
-            break
-
-    data = pd.DataFrame(candles)
-
-    if not data.empty:
-        data = data[['time', 'open', 'high', 'low', 'close', 'tickVolume']]
-        data['time'] = pd.to_datetime(data['time'])
-    
+    data = await sync_historical_candles(account, symbol, '4h', num_candles)
+
     print(f"Retrieved {len(data)} candles.")  # Debugging line
 
     return data
 
 
-def compute_indicators(data):
-    
-    data['MACD'] = data['close'].ewm(span=12, adjust=False).mean() - data['close'].ewm(span=26, adjust=False).mean()
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-
-    data['BB_Middle'] = data['close'].rolling(window=20).mean()
-    data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-    data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-
-    data['RSI'] = 100 - (100 / (1 + (data['close'].diff(1).where(data['close'].diff(1) > 0, 0).rolling(window=14).mean() /
-                               -data['close'].diff(1).where(data['close'].diff(1) < 0, 0).rolling(window=14).mean())))
-
-    data['ATR'] = data['close'].diff().abs().rolling(window=14).mean()
-    data['Momentum'] = data['close'] - data['close'].shift(4)
-    data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
-    data['Stochastic'] = ((data['close'] - data['low'].rolling(window=14).min()) / 
-                      (data['high'].rolling(window=14).max() - data['low'].rolling(window=14).min())) * 100
-    data['WilliamsR'] = ((data['high'].rolling(14).max() - data['close']) / 
-                     (data['high'].rolling(14).max() - data['low'].rolling(14).min())) * -100
-    data['CCI'] = (data['close'] - data['close'].rolling(20).mean()) / (0.015 * data['close'].rolling(20).std())
-    data['CV'] = data['close'].rolling(window=14).std() / data['close'].rolling(window=14).mean()
-    data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-    data['Donchian_Lower'] = data['low'].rolling(window=20).min()
-    data['Std_Dev'] = data['close'].rolling(window=14).std()
-    data['OBV'] = (np.sign(data['close'].diff()) * data['tickVolume']).cumsum()
-    data['ADL'] = ((data['close'] - data['low']) - (data['high'] - data['close'])) / (data['high'] - data['low']) * data['tickVolume']
-    return data
-
 def scale_features(data):
     """Scales the computed features using a pre-saved MinMaxScaler."""
     if len(data) < 30:
         raise ValueError(f"Insufficient data: Expected at least 30 rows, got {len(data)}")
 
-    X_scaler = joblib.load('X_scaler.pkl')
+    X_scaler = joblib.load(model_registry.live_path('X_scaler.pkl'))
     
     feature_columns = X_scaler.feature_names_in_
     
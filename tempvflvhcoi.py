@@ -5,7 +5,6 @@ import numpy as np
 import pandas as pd
 import joblib
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta, timezone
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
@@ -16,6 +15,8 @@ from tensorflow.keras.layers import Bidirectional, GRU, Dropout, Dense, Input, M
 from tensorflow.keras.regularizers import l2
 import tensorflow.keras.backend as K
 from metaapi_cloud_sdk import MetaApi
+from indicators import FEATURES, compute_indicators
+from candle_store import sync_historical_candles
 
 # Load credentials from settings.json
 with open('settings.json', 'r') as file:
@@ -35,18 +36,7 @@ async def retrieve_historical_candles():
         await account.wait_connected()
     
     num_candles = 15000
-    start_time = datetime.now(timezone.utc)
-    candles = []
-    while len(candles) < num_candles:
-        new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-        if not new_candles:
-            break
-        candles.extend(new_candles)
-        start_time = new_candles[0]['time'] - timedelta(hours=3)
-        if len(candles) >= num_candles:
-            candles = candles[:num_candles]
-            break
-    return pd.DataFrame(candles)
+    return await sync_historical_candles(account, symbol, '4h', num_candles)
 
 data = asyncio.run(retrieve_historical_candles())
 data['time'] = pd.to_datetime(data['time'])
@@ -59,54 +49,9 @@ state_encoder = LabelEncoder()
 state_encoded = state_encoder.fit_transform(price_states)
 
 
-def compute_indicators(data):
-    data['MACD'] = data['close'].ewm(span=12, adjust=False).mean() - data['close'].ewm(span=26, adjust=False).mean()
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-    data['BB_Middle'] = data['close'].rolling(window=20).mean()
-    data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-    data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-    data['RSI'] = 100 - (100 / (1 + (data['close'].diff(1).where(data['close'].diff(1) > 0, 0).rolling(window=14).mean() /
-                               -data['close'].diff(1).where(data['close'].diff(1) < 0, 0).rolling(window=14).mean())))
-    data['ATR'] = data['close'].diff().abs().rolling(window=14).mean()
-    data['Momentum'] = data['close'] - data['close'].shift(4)
-    data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
-    data['Stochastic'] = ((data['close'] - data['low'].rolling(window=14).min()) / 
-                      (data['high'].rolling(window=14).max() - data['low'].rolling(window=14).min())) * 100
-    data['WilliamsR'] = ((data['high'].rolling(14).max() - data['close']) / 
-                     (data['high'].rolling(14).max() - data['low'].rolling(14).min())) * -100
-    data['CCI'] = (data['close'] - data['close'].rolling(20).mean()) / (0.015 * data['close'].rolling(20).std())
-    data['CV'] = data['close'].rolling(window=14).std() / data['close'].rolling(window=14).mean()
-    data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-    data['Donchian_Lower'] = data['low'].rolling(window=20).min()
-    data['Std_Dev'] = data['close'].rolling(window=14).std()
-    data['OBV'] = (np.sign(data['close'].diff()) * data['volume']).cumsum()
-    data['ADL'] = ((data['close'] - data['low']) - (data['high'] - data['close'])) / (data['high'] - data['low']) * data['volume']
-
-    indicators = {
-        'MACD': data['MACD'],
-        'Signal_Line': data['Signal_Line'],
-        'RSI': data['RSI'],
-        'BB_Middle': data['BB_Middle'],
-        'BB_Upper': data['BB_Upper'],
-        'BB_Lower': data['BB_Lower'],
-        'ATR': data['ATR'],
-        'Momentum': data['Momentum'],
-        'ROC': data['ROC'],
-        'Stochastic': data['Stochastic'],
-        'WilliamsR': data['WilliamsR'],
-        'CCI': data['CCI'],
-        'CV': data['CV'],
-        'Donchian_Upper': data['Donchian_Upper'],
-        'Donchian_Lower': data['Donchian_Lower'],
-        'Std_Dev': data['Std_Dev'],
-        'OBV': data['OBV'],
-        'ADL': data['ADL']
-        }
-    indicators = list(indicators.keys())
-    return indicators
-
 scaler = MinMaxScaler()
-indicators = compute_indicators(data)
+compute_indicators(data)
+indicators = FEATURES
 scaled_features = scaler.fit_transform(data[indicators].dropna())
 
 min_length = min(len(scaled_features) - 1, len(price_changes[1:]))
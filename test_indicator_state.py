@@ -0,0 +1,83 @@
+import pickle
+import numpy as np
+import pandas as pd
+from indicators import FEATURES, compute_features
+from indicator_state import IndicatorState, STATE_VERSION
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-3, n))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + rng.uniform(0, 1e-3, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 1e-3, n)
+    volume = rng.integers(1, 5000, n).astype(float)
+    return high, low, close, volume
+
+
+def candles(high, low, close, volume):
+    time = pd.date_range('2024-01-01', periods=len(close), freq='4h', tz='UTC')
+    return pd.DataFrame({'time': time, 'high': high, 'low': low, 'close': close, 'tickVolume': volume})
+
+
+def feed(high, low, close, volume):
+    state = IndicatorState()
+    return state, np.array([state.update(*bar) for bar in zip(high, low, close, volume)])
+
+
+def test_matches_compute_features():
+    bars = random_walk(5000)
+    expected = compute_features(*bars, dtype=np.float64)
+    _, actual = feed(*bars)
+    assert np.array_equal(np.isnan(expected), np.isnan(actual)), "warmup NaN pattern differs"
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-9)
+
+
+def test_constant_price_window():
+    high, low, close, volume = random_walk(200)
+    # A flat stretch longer than every window: the market closed at one price
+    high[100:150] = low[100:150] = close[100:150] = close[99]
+    expected = compute_features(high, low, close, volume, dtype=np.float64)
+    _, actual = feed(high, low, close, volume)
+    assert not np.isinf(actual).any()
+    assert np.array_equal(np.isnan(expected), np.isnan(actual))
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-9)
+    cci = actual[120:150, FEATURES.index('CCI')]
+    assert np.isnan(cci).all()  # 0 / 0 once the 20-bar std is exactly 0
+    assert (actual[120:150, FEATURES.index('Std_Dev')] == 0).all()
+
+
+def test_update_frame_skips_seen_bars():
+    data = candles(*random_walk(300))
+    expected = IndicatorState()
+    expected.update_frame(data)
+
+    state = IndicatorState()
+    state.update_frame(data.iloc[:200])
+    rows = state.update_frame(data.iloc[150:])  # 50 bars overlap with the first frame
+    assert rows.shape == (100, len(FEATURES))
+    assert state.count == expected.count == 300
+    assert state.last_time == data['time'].iloc[-1]
+    assert len(state.update_frame(data)) == 0
+    np.testing.assert_array_equal(np.array(state.rows), np.array(expected.rows))
+
+
+def test_save_load_round_trip(tmp_path):
+    high, low, close, volume = random_walk(300)
+    data = candles(high, low, close, volume)
+    path = str(tmp_path / 'state.pkl')
+    state = IndicatorState()
+    state.update_frame(data.iloc[:250])
+    state.save(path)
+
+    restored = IndicatorState.load(path)
+    assert restored.last_time == state.last_time
+    np.testing.assert_array_equal(restored.update_frame(data), state.update_frame(data))
+
+
+def test_load_rejects_missing_and_other_versions(tmp_path):
+    path = str(tmp_path / 'state.pkl')
+    assert IndicatorState.load(path) is None
+    with open(path, 'wb') as f:
+        pickle.dump({'version': STATE_VERSION - 1, 'state': IndicatorState()}, f)
+    assert IndicatorState.load(path) is None
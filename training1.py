@@ -1,20 +1,25 @@
 import os
+import sys
 import asyncio
 import json
 import numpy as np
 import pandas as pd
 import joblib
-import pickle
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta, timezone
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import GRU, Dropout, Dense
 from tensorflow.keras.callbacks import EarlyStopping
 from metaapi_cloud_sdk import MetaApi
+from candle_store import sync_historical_candles, drop_open_bar
+from candle_backfill import RequestBudget, timeframe_to_timedelta
+from resample import resample_candles
+import training_data
+from window_dataset import WindowDataset, window_count
+import prepared_dataset
+import model_registry
+from training_checkpoint import TrainingCheckpoint
+from training_profile import ThroughputReport, build_gru, configure_threads, get_profile, scaled_learning_rate
 
 # Load credentials from settings.json
 with open('settings.json', 'r') as file:
@@ -24,6 +29,13 @@ token = settings.get('metaapi_access_token')
 account_id = settings.get('metaapi_accountid')
 symbol = os.getenv('SYMBOL') or 'EURUSD'
 domain = settings.get('domain') or 'agiliumtrade.agiliumtrade.ai'
+timeframe = os.getenv('TIMEFRAME') or '4h'
+# Set e.g. BASE_TIMEFRAME=1h to download only the base timeframe and derive TIMEFRAME locally
+base_timeframe = os.getenv('BASE_TIMEFRAME') or timeframe
+
+# Several symbols (SYMBOLS=EURUSD,GBPUSD,...) train one model on a shared streaming dataset
+symbols = (os.getenv('SYMBOLS') or symbol).split(',')
+num_candles = int(os.getenv('NUM_CANDLES') or 20000)
 
 async def retrieve_historical_candles():
     api = MetaApi(token, {'domain': domain})
@@ -33,147 +45,108 @@ async def retrieve_historical_candles():
         await account.deploy()
     if account.connection_status != 'CONNECTED':
         await account.wait_connected()
-    
-    num_candles = 20000
-    start_time = datetime.now(timezone.utc)
-    candles = []
-    
-    while len(candles) < num_candles:
-        new_candles = await account.get_historical_candles(symbol, '4h', start_time)
-        if not new_candles:
-            break
-        candles.extend(new_candles)
-        start_time = new_candles[0]['time'] - timedelta(hours=4)
-        if len(candles) >= num_candles:
-            candles = candles[:num_candles]
-            break
-
-    df = pd.DataFrame(candles)
-    
-    if not df.empty:
-        df = df[['time', 'open', 'high', 'low', 'close', 'tickVolume']]  # Keep only relevant columns
-        df['time'] = pd.to_datetime(df['time'])  # Convert time column to datetime
-    return df
 
-# Load and preprocess data
-data = asyncio.run(retrieve_historical_candles())
-prices = data['close'].values
+    # One budget for all symbols, so together they stay within the account's rate and concurrency limits
+    budget = RequestBudget()
 
-# Compute price changes and label encoding
-price_changes = np.diff(prices)
-price_states = ['Up' if change > 0.001 else 'Down' if change < -0.001 else 'Stable' for change in price_changes]
-state_encoder = LabelEncoder()
-state_encoded = state_encoder.fit_transform(price_states)
+    async def retrieve(symbol):
+        # Only candles newer than the local store are downloaded
+        if base_timeframe == timeframe:
+            # Train on closed bars only; the walk-forward cut-off is the last of them
+            return drop_open_bar(await sync_historical_candles(account, symbol, timeframe, num_candles,
+                                                               budget=budget), timeframe)
 
+        ratio = timeframe_to_timedelta(timeframe) // timeframe_to_timedelta(base_timeframe)
+        base = await sync_historical_candles(account, symbol, base_timeframe, num_candles * ratio, budget=budget)
+        # Drop the forming base bar first, or a bucket it ends would look complete to resample_candles
+        base = drop_open_bar(base, base_timeframe)
+        return resample_candles(base, base_timeframe, timeframe).iloc[-num_candles:].reset_index(drop=True)
 
-def compute_indicators(data):
-    
-    data['MACD'] = data['close'].ewm(span=12, adjust=False).mean() - data['close'].ewm(span=26, adjust=False).mean()
-    data['Signal_Line'] = data['MACD'].ewm(span=9, adjust=False).mean()
-
-    data['BB_Middle'] = data['close'].rolling(window=20).mean()
-    data['BB_Upper'] = data['BB_Middle'] + 2 * data['close'].rolling(window=20).std()
-    data['BB_Lower'] = data['BB_Middle'] - 2 * data['close'].rolling(window=20).std()
-
-    data['RSI'] = 100 - (100 / (1 + (data['close'].diff(1).where(data['close'].diff(1) > 0, 0).rolling(window=14).mean() /
-                               -data['close'].diff(1).where(data['close'].diff(1) < 0, 0).rolling(window=14).mean())))
-
-    data['ATR'] = data['close'].diff().abs().rolling(window=14).mean()
-    data['Momentum'] = data['close'] - data['close'].shift(4)
-    data['ROC'] = (data['close'] - data['close'].shift(14)) / data['close'].shift(14) * 100
-    data['Stochastic'] = ((data['close'] - data['low'].rolling(window=14).min()) / 
-                      (data['high'].rolling(window=14).max() - data['low'].rolling(window=14).min())) * 100
-    data['WilliamsR'] = ((data['high'].rolling(14).max() - data['close']) / 
-                     (data['high'].rolling(14).max() - data['low'].rolling(14).min())) * -100
-    data['CCI'] = (data['close'] - data['close'].rolling(20).mean()) / (0.015 * data['close'].rolling(20).std())
-    data['CV'] = data['close'].rolling(window=14).std() / data['close'].rolling(window=14).mean()
-    data['Donchian_Upper'] = data['high'].rolling(window=20).max()
-    data['Donchian_Lower'] = data['low'].rolling(window=20).min()
-    data['Std_Dev'] = data['close'].rolling(window=14).std()
-    data['OBV'] = (np.sign(data['close'].diff()) * data['tickVolume']).cumsum()
-    data['ADL'] = ((data['close'] - data['low']) - (data['high'] - data['close'])) / (data['high'] - data['low']) * data['tickVolume']
-
-    indicators = {
-        'MACD': data['MACD'],
-        'Signal_Line': data['Signal_Line'],
-        'RSI': data['RSI'],
-        'BB_Middle': data['BB_Middle'],
-        'BB_Upper': data['BB_Upper'],
-        'BB_Lower': data['BB_Lower'],
-        'ATR': data['ATR'],
-        'Momentum': data['Momentum'],
-        'ROC': data['ROC'],
-        'Stochastic': data['Stochastic'],
-        'WilliamsR': data['WilliamsR'],
-        'CCI': data['CCI'],
-        'CV': data['CV'],
-        'Donchian_Upper': data['Donchian_Upper'],
-        'Donchian_Lower': data['Donchian_Lower'],
-        'Std_Dev': data['Std_Dev'],
-        'OBV': data['OBV'],
-        'ADL': data['ADL']
-        }
-
-    # List of indicators
-    indicators = list(indicators.keys())
-    return indicators
+    return dict(zip(symbols, await asyncio.gather(*[retrieve(symbol) for symbol in symbols])))
+
+# RETRAIN=warm fine-tunes the published model on the bars added since its
+# cut-off instead of training a new one from scratch
+warm_start = os.getenv('RETRAIN') == 'warm'
+FINE_TUNE_EPOCHS = 10
+FINE_TUNE_LEARNING_RATE = 1e-4
+VALIDATION_FRACTION = 0.2  # newest share of the new windows held out for validation
+MIN_NEW_WINDOWS = 10
+
+# TRAINING_PROFILE=cpu switches to larger batches, tuned thread pools and XLA
+profile = get_profile()
+
+
+def make_dataset(series, indices, shuffle=False):
+    return WindowDataset(series, indices, batch_size=profile['batch_size'], shuffle=shuffle, seed=42,
+                         workers=profile['workers'], max_queue_size=profile['max_queue_size'])
 
 
 # Prepare data for training
-def prepare_data(data):
-    indicators = compute_indicators(data)
-    data.dropna(inplace=True)
-
-    X_scaler = MinMaxScaler()
-    y_scaler = MinMaxScaler()
-
-    X = X_scaler.fit_transform(data[indicators])
-    y = data['close'].shift(-3).dropna().values.reshape(-1, 1)
-    y_scaled = y_scaler.fit_transform(y)
-
-    with open("X_scaler.pkl", "wb") as f:
-        pickle.dump(X_scaler, f)
-    with open("y_scaler.pkl", "wb") as f:
-        pickle.dump(y_scaler, f)
-
-    X_seq, y_seq = [], []
-    sequence_length = 30
-    for i in range(sequence_length, len(X) - 3):
-        X_seq.append(X[i-sequence_length:i])
-        y_seq.append(y_scaled[i][0])
-    return np.array(X_seq), np.array(y_seq)
-
-X, y = prepare_data(data)
-X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.3, random_state=42)
-X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
-
-def train_model(X_train, y_train, X_val, y_val, save_path="gru_model.keras"):
-    model = Sequential([
-        GRU(64, return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])),
-        Dropout(0.3),
-        GRU(64),
-        Dropout(0.3),
-        Dense(1, activation='linear')  # Corrected activation
-    ])
-    
+def build_dataset(candles):
+    """Builds (or reuses, if the candles are unchanged) the versioned dataset artifact."""
+    dataset = prepared_dataset.build_dataset(candles, timeframe)
+    print(f"Prepared dataset {dataset.version} at {dataset.path}.")
+    return dataset
+
+
+def train_model(train_data, val_data):
     early_stop = EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)
-    model.compile(optimizer='adam', loss='mse', metrics=['mae'])
-    
-    history = model.fit(X_train, y_train, epochs=50, batch_size=8, validation_data=(X_val, y_val), callbacks=[early_stop])
+    # RESUME=1 continues an interrupted run from its latest checkpoint
+    checkpoint = TrainingCheckpoint('gru', early_stop)
+    model = checkpoint.load_model()
+    if model is None:
+        model = build_gru(train_data.window_shape, profile['learning_rate'], profile['jit_compile'])
     
-    model.save(save_path)
-    print(f"Model saved at {save_path}.")
+    throughput = ThroughputReport(len(train_data.indices))
+    history = model.fit(train_data, epochs=50, initial_epoch=checkpoint.initial_epoch, validation_data=val_data,
+                        callbacks=[early_stop, throughput, checkpoint])
     return model, history
 
-# Train model with fixes
-model, history = train_model(X_train, y_train, X_val, y_val)
 
-# Evaluate the model
-def evaluate_model(model, X_test, y_test):
-    with open("y_scaler.pkl", "rb") as f:
-        y_scaler = pickle.load(f)
+def fine_tune(candles, manifest):
+    """Continues training the live model on windows whose target is newer than its cut-off."""
+    X_scaler, y_scaler = model_registry.load_scalers(manifest)
+    series, train_idx, val_idx = [], [], []
+    offset = 0
+    for symbol, data in candles.items():
+        X, y, target_times = training_data.scaled_series(data, symbol, timeframe, X_scaler, y_scaler)
+        cutoff = manifest['cutoffs'].get(symbol)
+        new = np.flatnonzero(target_times > pd.Timestamp(cutoff)) if cutoff else np.arange(len(target_times))
+        # Validate on the newest windows, fine-tune on the ones before them
+        split = len(new) - max(1, int(len(new) * VALIDATION_FRACTION))
+        train_idx.append(offset + new[:split])
+        val_idx.append(offset + new[split:])
+        series.append((X, y))
+        offset += len(target_times)
+    train_idx, val_idx = np.concatenate(train_idx), np.concatenate(val_idx)
+    if len(train_idx) + len(val_idx) < MIN_NEW_WINDOWS:
+        print(f"Only {len(train_idx) + len(val_idx)} new windows since the last cut-off; nothing to retrain.")
+        return None, X_scaler, y_scaler
+
+    model = tf.keras.models.load_model(model_registry.live_path(model_registry.MODEL_PATH, manifest))
+    train_data = make_dataset(series, train_idx, shuffle=True)
+    val_data = make_dataset(series, val_idx)
+    baseline = model.evaluate(val_data, verbose=0, return_dict=True)['loss']
+
+    learning_rate = scaled_learning_rate(profile['batch_size'], FINE_TUNE_LEARNING_RATE)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='mse', metrics=['mae'],
+                  jit_compile=profile['jit_compile'])
+    early_stop = EarlyStopping(monitor="val_loss", patience=3, restore_best_weights=True)
+    throughput = ThroughputReport(len(train_idx))
+    history = model.fit(train_data, epochs=FINE_TUNE_EPOCHS, validation_data=val_data,
+                        callbacks=[early_stop, throughput])
+    val_loss = min(history.history['val_loss'])
+    print(f"Fine-tuned on {len(train_idx)} windows: val_loss {baseline:.6f} -> {val_loss:.6f}")
+    if val_loss > baseline:
+        print("Fine-tuning did not improve on the live model; keeping it.")
+        return None, X_scaler, y_scaler
+    return model, X_scaler, y_scaler
+
 
-    y_pred = model.predict(X_test)
+# Evaluate the model
+def evaluate_model(model, test_data, y_scaler):
+    y_pred = model.predict(test_data)
+    y_test = test_data.targets()
     y_pred_inversed = y_scaler.inverse_transform(y_pred)
     y_test_inversed = y_scaler.inverse_transform(y_test.reshape(-1, 1))
 
@@ -182,5 +155,56 @@ def evaluate_model(model, X_test, y_test):
     print(f"Actual: {y_test_inversed[:5].flatten()}")
     return y_pred_inversed, y_test_inversed
 
-evaluate_model(model, X_test, y_test)
-print(X_train.shape, y_train.shape)
\ No newline at end of file
+
+def train(dataset):
+    """Trains a new model on a prepared dataset, publishes it and evaluates it."""
+    series = dataset.series
+    # Split window indices rather than windowed arrays, so nothing is copied up front
+    train_idx, temp_idx = train_test_split(np.arange(window_count(series)), test_size=0.3, random_state=42)
+    val_idx, test_idx = train_test_split(temp_idx, test_size=0.5, random_state=42)
+    train_data = make_dataset(series, train_idx, shuffle=True)
+    val_data = make_dataset(series, val_idx)
+    test_data = make_dataset(series, test_idx)
+
+    # Train model with fixes
+    model, history = train_model(train_data, val_data)
+    model_registry.publish_model(model, dataset.X_scaler, dataset.y_scaler, dataset.cutoffs,
+                                 dataset.manifest['timeframe'], dataset=dataset.version)
+
+    evaluate_model(model, test_data, dataset.y_scaler)
+    print(len(train_idx), train_data.window_shape)
+
+
+def retrain(candles, manifest):
+    """Walk-forward step: fine-tunes the live model and publishes it if it improved."""
+    model, X_scaler, y_scaler = fine_tune(candles, manifest)
+    if model is not None:
+        cutoffs = {symbol: data['time'].iloc[-1] for symbol, data in candles.items()}
+        # Symbols not in this run keep their previous cut-off
+        model_registry.publish_model(model, X_scaler, y_scaler, {**manifest['cutoffs'], **cutoffs}, timeframe,
+                                     parent=manifest['version'])
+
+
+def main(stage='all'):
+    """stage 'build' only downloads candles and prepares the dataset, 'train' trains on
+    the latest prepared dataset (or DATASET=<version>) without downloading, 'all' does both."""
+    configure_threads(profile)
+    if stage == 'train':
+        train(prepared_dataset.load_dataset(os.getenv('DATASET')))
+        return
+
+    candles = asyncio.run(retrieve_historical_candles())
+    manifest = model_registry.current_manifest() if warm_start and stage == 'all' else None
+    if warm_start and stage == 'all' and manifest is None:
+        print("No published model to warm-start from; training from scratch.")
+    if manifest is not None:
+        retrain(candles, manifest)
+        return
+
+    dataset = build_dataset(candles)
+    if stage == 'all':
+        train(dataset)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else 'all')
@@ -0,0 +1,96 @@
+import os
+import json
+import shutil
+import numpy as np
+import tensorflow as tf
+from candle_backfill import atomic_write
+
+# Periodic checkpoints for long training runs. Every `every` epochs the whole
+# model (weights and optimizer state), the epoch and the EarlyStopping
+# counters and best weights are written to a fresh epoch-NNNN directory, and
+# only then does LATEST_FILE switch to it, so a run killed at any point
+# resumes from the last complete checkpoint. A finished run deletes its
+# checkpoints, so the next run starts from scratch.
+
+CHECKPOINT_ROOT = 'checkpoints'
+LATEST_FILE = 'latest.json'
+RESUME = os.getenv('RESUME') == '1'  # continue from the latest checkpoint instead of epoch 0
+
+
+class TrainingCheckpoint(tf.keras.callbacks.Callback):
+    """Saves resumable training state and restores EarlyStopping's on resume."""
+
+    def __init__(self, name, early_stopping=None, every=1, resume=RESUME, root=CHECKPOINT_ROOT):
+        super().__init__()
+        self.directory = os.path.join(root, name)
+        self.early_stopping = early_stopping
+        self.every = every
+        self.state = self._latest() if resume else None
+        if not resume:
+            # A fresh run must not leave a stale checkpoint behind for a later resume
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _latest(self):
+        try:
+            with open(os.path.join(self.directory, LATEST_FILE)) as f:
+                latest = json.load(f)
+            with open(os.path.join(self.directory, latest['checkpoint'], 'state.json')) as f:
+                return dict(json.load(f), checkpoint=latest['checkpoint'])
+        except (FileNotFoundError, KeyError, json.JSONDecodeError):
+            return None
+
+    @property
+    def initial_epoch(self):
+        """Epoch to pass to fit(initial_epoch=...) when resuming."""
+        return self.state['epoch'] + 1 if self.state else 0
+
+    def load_model(self):
+        """The checkpointed model with its optimizer state, or None if there is no checkpoint."""
+        if self.state is None:
+            return None
+        print(f"Resuming from {self.state['checkpoint']} (epoch {self.state['epoch'] + 1}).")
+        # safe_mode=False lets models with Lambda layers load; these are our own files
+        return tf.keras.models.load_model(os.path.join(self.directory, self.state['checkpoint'], 'model.keras'),
+                                          safe_mode=False)
+
+    def on_train_begin(self, logs=None):
+        # Runs after EarlyStopping.on_train_begin has reset it, so the restore sticks
+        if self.state is None or self.early_stopping is None:
+            return
+        for key, value in self.state['early_stopping'].items():
+            setattr(self.early_stopping, key, value)
+        weights_path = os.path.join(self.directory, self.state['checkpoint'], 'best_weights.npz')
+        if os.path.exists(weights_path):
+            with np.load(weights_path) as weights:
+                self.early_stopping.best_weights = [weights[f"arr_{i}"] for i in range(len(weights.files))]
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every:
+            return
+        checkpoint = f"epoch-{epoch + 1:04d}"
+        path = os.path.join(self.directory, checkpoint)
+        os.makedirs(path, exist_ok=True)
+        self.model.save(os.path.join(path, 'model.keras'))
+        state = {'epoch': epoch, 'early_stopping': {}}
+        if self.early_stopping is not None:
+            state['early_stopping'] = {key: float(getattr(self.early_stopping, key)) if key == 'best'
+                                       else int(getattr(self.early_stopping, key))
+                                       for key in ('wait', 'best', 'best_epoch', 'stopped_epoch')
+                                       if hasattr(self.early_stopping, key)}
+            if self.early_stopping.best_weights is not None:
+                np.savez(os.path.join(path, 'best_weights.npz'), *self.early_stopping.best_weights)
+        with open(os.path.join(path, 'state.json'), 'w') as f:
+            json.dump(state, f)
+
+        # Switch to the new checkpoint only once it is complete, then drop the old one
+        atomic_write(os.path.join(self.directory, LATEST_FILE),
+                     lambda f: json.dump({'checkpoint': checkpoint}, f), 'w')
+        previous = self.state['checkpoint'] if self.state else None
+        if previous and previous != checkpoint:
+            shutil.rmtree(os.path.join(self.directory, previous), ignore_errors=True)
+        self.state = dict(state, checkpoint=checkpoint)
+
+    def on_train_end(self, logs=None):
+        # Reached only when fit returns normally (finished or stopped early), not when killed
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.state = None
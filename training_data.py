@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from candle_backfill import atomic_write
+from indicators import FEATURES
+from feature_cache import get_feature_cache
+from sequences import sliding_windows
+
+# Feature matrix -> scaled model sequences for training. The whole path runs
+# in one dtype: float32 by default, which is what the GRU computes in anyway,
+# so features, scaled features and the (N, 30, 18) sequence tensor take half
+# the memory of the float64 path. Set PRECISION=float64 to get the old path.
+# build_series writes the scaled series to disk for streaming training over
+# more history than fits in RAM (see window_dataset.py).
+
+SEQUENCE_LENGTH = 30
+HORIZON = 3  # bars ahead of the window's last row that the model predicts
+PRECISION = np.dtype(os.getenv('PRECISION') or 'float32')
+SERIES_DIR = 'training_sets'  # memory-mapped scaled series for streaming training
+
+
+def feature_matrix(data, symbol, timeframe, dtype=PRECISION, features=FEATURES):
+    """Returns the (cached) feature matrix and closes, without the warmup rows."""
+    values = get_feature_cache().features(symbol, timeframe, data, dtype=dtype, features=features)
+    valid = np.isfinite(values).all(axis=1)
+    return values[valid], data['close'].to_numpy(dtype=dtype)[valid]
+
+
+def scale(values, close, features=FEATURES):
+    """Fits the X/y MinMaxScalers and returns scaled features, scaled targets and both scalers.
+
+    X is fitted on a frame so the scaler keeps feature_names_in_ for the live
+    trader; MinMaxScaler preserves float32 input.
+    """
+    X_scaler = MinMaxScaler()
+    y_scaler = MinMaxScaler()
+    X = X_scaler.fit_transform(pd.DataFrame(values, columns=features, copy=False))
+    # Target for row i is the close HORIZON bars later
+    y = y_scaler.fit_transform(close[HORIZON:].reshape(-1, 1))
+    return X, y, X_scaler, y_scaler
+
+
+def make_sequences(X, y, sequence_length=SEQUENCE_LENGTH):
+    """Windows X[i-sequence_length:i] with targets y[i], as read-only views over X and y."""
+    return sliding_windows(X, sequence_length, y[:, 0], count=len(X) - sequence_length - HORIZON)
+
+
+def prepare_data(data, symbol, timeframe, dtype=PRECISION, features=FEATURES):
+    """Candles -> (X_seq, y_seq, X_scaler, y_scaler) in a single dtype."""
+    values, close = feature_matrix(data, symbol, timeframe, dtype, features)
+    X, y, X_scaler, y_scaler = scale(values, close, features)
+    X_seq, y_seq = make_sequences(X, y)
+    return X_seq, y_seq, X_scaler, y_scaler
+
+
+def build_series(candles, timeframe, dtype=PRECISION, features=FEATURES, root=SERIES_DIR):
+    """Scales every symbol's features and writes them as memory-mapped series.
+
+    candles maps symbol -> candle frame. The scalers are fitted across all
+    symbols with partial_fit, one symbol in memory at a time, and each scaled
+    X/y pair is saved under root and reopened with mmap_mode='r'. Returns
+    ([(X, y), ...], X_scaler, y_scaler).
+    """
+    X_scaler = MinMaxScaler()
+    y_scaler = MinMaxScaler()
+    for symbol, data in candles.items():
+        values, close = feature_matrix(data, symbol, timeframe, dtype, features)
+        X_scaler.partial_fit(pd.DataFrame(values, columns=features, copy=False))
+        y_scaler.partial_fit(close[HORIZON:].reshape(-1, 1))
+
+    os.makedirs(root, exist_ok=True)
+    series = []
+    for symbol, data in candles.items():
+        # Features come back from the feature cache on this second pass
+        values, close = feature_matrix(data, symbol, timeframe, dtype, features)
+        arrays = {
+            'X': X_scaler.transform(pd.DataFrame(values, columns=features, copy=False)),
+            'y': y_scaler.transform(close[HORIZON:].reshape(-1, 1)),
+        }
+        paths = {name: os.path.join(root, f"{symbol}_{timeframe}_{name}.npy") for name in arrays}
+        for name, array in arrays.items():
+            atomic_write(paths[name], lambda f: np.save(f, array))
+        series.append((np.load(paths['X'], mmap_mode='r'), np.load(paths['y'], mmap_mode='r')))
+    return series, X_scaler, y_scaler
+
+
+def scaled_series(data, symbol, timeframe, X_scaler, y_scaler, dtype=PRECISION):
+    """Scales a symbol's features with already fitted scalers, for fine-tuning a trained model.
+
+    Returns X, y and the time of the bar each window predicts, so windows can
+    be picked by how new their target is.
+    """
+    features = list(X_scaler.feature_names_in_)
+    values = get_feature_cache().features(symbol, timeframe, data, dtype=dtype, features=features)
+    valid = np.isfinite(values).all(axis=1)
+    X = X_scaler.transform(pd.DataFrame(values[valid], columns=features, copy=False)).astype(dtype, copy=False)
+    close = data['close'].to_numpy(dtype=dtype)[valid]
+    y = y_scaler.transform(close[HORIZON:].reshape(-1, 1)).astype(dtype, copy=False)
+    # Window s covers rows s..s + SEQUENCE_LENGTH - 1 and predicts the close at row s + SEQUENCE_LENGTH + HORIZON
+    target_times = pd.DatetimeIndex(data['time'])[valid][SEQUENCE_LENGTH + HORIZON:]
+    return X, y, target_times
@@ -0,0 +1,81 @@
+import os
+import math
+import time
+import tensorflow as tf
+from window_dataset import BATCH_SIZE, MAX_QUEUE_SIZE, WORKERS
+
+# Training profiles for the GRU. 'default' is the original setup (batch 8,
+# Adam at 1e-3, TensorFlow's own threading). 'cpu' is tuned for the CPU-only
+# training hosts: explicit intra/inter-op pools, batches large enough that a
+# step is dominated by math rather than per-step overhead, the learning rate
+# scaled up to match, XLA-compiled train steps and more batches prefetched.
+# Select one with TRAINING_PROFILE; benchmark_training.py compares them.
+
+BASE_BATCH_SIZE = BATCH_SIZE
+BASE_LEARNING_RATE = 1e-3
+
+PROFILES = {
+    'default': {'batch_size': BATCH_SIZE, 'jit_compile': False, 'intra_op_threads': 0, 'inter_op_threads': 0,
+                'workers': WORKERS, 'max_queue_size': MAX_QUEUE_SIZE},
+    'cpu': {'batch_size': 128, 'jit_compile': True, 'intra_op_threads': os.cpu_count(), 'inter_op_threads': 2,
+            'workers': WORKERS, 'max_queue_size': 2 * MAX_QUEUE_SIZE},
+}
+
+
+def scaled_learning_rate(batch_size, base_learning_rate=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE):
+    """Square-root learning-rate scaling, which suits Adam better than the linear rule."""
+    return base_learning_rate * math.sqrt(batch_size / base_batch_size)
+
+
+def get_profile(name=None):
+    """Returns the named profile (TRAINING_PROFILE, else 'default') with its learning rate filled in."""
+    name = name or os.getenv('TRAINING_PROFILE') or 'default'
+    if name not in PROFILES:
+        raise ValueError(f"Unknown training profile: {name}")
+    profile = dict(PROFILES[name], name=name)
+    profile['learning_rate'] = scaled_learning_rate(profile['batch_size'])
+    return profile
+
+
+def build_gru(input_shape, learning_rate, jit_compile=False):
+    """The training1 GRU, compiled with the given learning rate."""
+    model = tf.keras.Sequential([
+        tf.keras.layers.GRU(64, return_sequences=True, input_shape=input_shape),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.GRU(64),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.Dense(1, activation='linear')
+    ])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='mse', metrics=['mae'],
+                  jit_compile=jit_compile)
+    return model
+
+
+def configure_threads(profile):
+    """Sets TensorFlow's thread pools; must run before the first TensorFlow op (0 keeps the default)."""
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(profile['intra_op_threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(profile['inter_op_threads'])
+    except RuntimeError:
+        print("TensorFlow is already initialized; keeping its thread pools.")
+
+
+class ThroughputReport(tf.keras.callbacks.Callback):
+    """Prints training samples/sec for every epoch, validation time excluded."""
+
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.rates = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.perf_counter()
+        self.last_batch = self.started
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.last_batch = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.samples_per_epoch / max(self.last_batch - self.started, 1e-9)
+        self.rates.append(rate)
+        print(f"Epoch {epoch + 1}: {rate:,.0f} samples/sec")
@@ -0,0 +1,77 @@
+import numpy as np
+from tensorflow.keras.utils import PyDataset
+from training_data import SEQUENCE_LENGTH, make_sequences
+
+# Streams training batches straight from the memory-mapped feature series
+# written by training_data.build_series. Windows are strided views over the
+# memmaps, so only the windows of the batch being produced are ever read into
+# RAM; Keras prefetches upcoming batches on worker threads while the current
+# one trains. Several symbols are served as one dataset by a global window
+# index, which is what gets shuffled and split.
+
+BATCH_SIZE = 8
+WORKERS = 4  # threads preparing batches ahead of the training step
+MAX_QUEUE_SIZE = 16  # batches prefetched
+
+
+class WindowDataset(PyDataset):
+    """Batches of (window, target) pairs drawn from one or more (X, y) series.
+
+    columns optionally selects a subset of the feature columns; it is applied
+    per batch, so the series themselves are never copied.
+    """
+
+    def __init__(self, series, indices=None, batch_size=BATCH_SIZE, shuffle=True, seed=None,
+                 workers=WORKERS, max_queue_size=MAX_QUEUE_SIZE, sequence_length=SEQUENCE_LENGTH, columns=None,
+                 **kwargs):
+        super().__init__(workers=workers, max_queue_size=max_queue_size, **kwargs)
+        self.windows, self.series_targets = zip(*(make_sequences(X, y, sequence_length) for X, y in series))
+        self.columns = None if columns is None else np.asarray(columns)
+        # offsets[k] is the global index of series k's first window
+        self.offsets = np.cumsum([0] + [len(windows) for windows in self.windows])
+        self.indices = np.arange(self.offsets[-1]) if indices is None else np.asarray(indices)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = self.rng.permutation(self.indices) if shuffle else self.indices
+
+    @property
+    def window_shape(self):
+        """(sequence length, feature count), the model's input shape."""
+        length, features = self.windows[0].shape[1:]
+        return length, features if self.columns is None else len(self.columns)
+
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+
+    def _gather(self, batch):
+        series = np.searchsorted(self.offsets, batch, side='right') - 1
+        X = np.empty((len(batch),) + self.window_shape, dtype=self.windows[0].dtype)
+        y = np.empty(len(batch), dtype=self.series_targets[0].dtype)
+        for k in np.unique(series):
+            rows = series == k
+            local = batch[rows] - self.offsets[k]
+            X[rows] = self.windows[k][local] if self.columns is None else self.windows[k][local][:, :, self.columns]
+            y[rows] = self.series_targets[k][local]
+        return X, y
+
+    def __getitem__(self, index):
+        return self._gather(self.order[index * self.batch_size:(index + 1) * self.batch_size])
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.order = self.rng.permutation(self.indices)
+
+    def targets(self):
+        """All targets in the order batches are served (for evaluating predictions)."""
+        series = np.searchsorted(self.offsets, self.order, side='right') - 1
+        y = np.empty(len(self.order), dtype=self.series_targets[0].dtype)
+        for k in np.unique(series):
+            rows = series == k
+            y[rows] = self.series_targets[k][self.order[rows] - self.offsets[k]]
+        return y
+
+
+def window_count(series, sequence_length=SEQUENCE_LENGTH):
+    """Total number of windows across series, i.e. the range of the global index."""
+    return sum(len(make_sequences(X, y, sequence_length)[0]) for X, y in series)